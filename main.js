@@ -1,27 +1,178 @@
 import 'dotenv/config';
 import TelegramBot from 'node-telegram-bot-api';
 import axios from 'axios';
+import https from 'node:https';
+import fs from 'node:fs';
+import path from 'node:path';
+import crypto from 'node:crypto';
+import http from 'node:http';
+import { performance, monitorEventLoopDelay } from 'node:perf_hooks';
 
 const {
   TELEGRAM_TOKEN,
   TELEGRAM_CHAT_ID,
+  TELEGRAM_CHATS = '',
   POLL_INTERVAL_MINUTES = '5',
   TRENDING_SIZE = '8',
   MIN_LIQ = '200',
   BLOCKED_TOKENS = 'WAGMI',
+  DISCOVERY_SORTS = 'h24_volume_usd_desc,h1_volume_usd_desc',
+  DISCOVERY_PAGES = '3',
+  DISCOVERY_NEW_POOLS = 'true',
+  FETCH_CONCURRENCY = '3',
+  GECKO_RPM = '30',
+  GECKO_BURST = '5',
+  GECKO_BUDGETS = 'ohlcv:12,alerts:4',
+  GECKO_MAX_RETRIES = '4',
+  LAUNCH_CONCURRENCY = '3',
+  STATE_FILE = 'data/state.jsonl',
+  STATE_SNAPSHOT_MINUTES = '30',
+  STATE_CACHE_MAX = '5000',
+  STATE_TTL_HOURS = '72',
+  PIN_MODE = 'edit',
+  BOARD_CHANGE_THRESHOLDS = 'price:1,vol:10,liq:10,chg:2,tx:5',
+  BOARD_MAX_SKIP_MINUTES = '30',
+  SEND_CONCURRENCY = '4',
+  TG_GLOBAL_PER_SEC = '30',
+  TG_CHAT_PER_SEC = '1',
+  TG_MAX_RETRIES = '3',
+  ALERT_DIGEST_THRESHOLD = '3',
+  ALERT_DIGEST_MAX = '15',
+  ALERT_DEDUPE_HOURS = '4',
+  ALERT_MAX_AGE_MINUTES = '30',
+  CHAIN_WS_URL = '',
+  DEX_FACTORIES = '',
+  CHAIN_RPC_URL = '',
+  SWAP_INDEXER_POOLS = '0',
+  SERIES_LENGTH = '24',
+  SERIES_EWMA_ALPHA = '0.3',
+  ALERT_POLL_SECONDS = '20',
+  DISCOVERY_INTERVAL_MINUTES = '15',
+  WATCH_TTL_MINUTES = '60',
+  GECKO_CACHE_TTL_SECONDS = '20',
+  BREAKER_FAILURES = '3',
+  BREAKER_COOLDOWN_MINUTES = '10',
+  METRICS_PORT = '',
 } = process.env;
 
-if (!TELEGRAM_TOKEN || !TELEGRAM_CHAT_ID)
-  throw new Error('Missing TELEGRAM_TOKEN or TELEGRAM_CHAT_ID');
+if (!TELEGRAM_TOKEN || !(TELEGRAM_CHAT_ID || TELEGRAM_CHATS))
+  throw new Error('Missing TELEGRAM_TOKEN or TELEGRAM_CHAT_ID/TELEGRAM_CHATS');
+
+// ─── Bounded cache ─────────────────────────────────────────────────────────────
+// Map-backed LRU with a last-seen TTL. Map order is last-seen order, so the head
+// is always the entry closest to expiry and pruning stops at the first live one.
+// With refresh: false a get() leaves the entry alone, making the TTL count from
+// the write (a plain response cache).
+
+class BoundedCache {
+  constructor({ max = Infinity, ttlMs = Infinity, refresh = true } = {}) {
+    this.max       = max;
+    this.ttlMs     = ttlMs;
+    this.refresh   = refresh;
+    this.map       = new Map(); // key -> { value, seen }
+    this.hits      = 0;
+    this.misses    = 0;
+    this.evictions = 0;
+  }
+
+  get size() {
+    return this.map.size;
+  }
+
+  live(e, now) {
+    return now - e.seen <= this.ttlMs;
+  }
+
+  // Counts as a hit/miss and marks the entry as seen
+  get(key) {
+    const e = this.map.get(key);
+    if (!e || !this.live(e, Date.now())) {
+      if (e) this.evict(key);
+      this.misses++;
+      return undefined;
+    }
+    this.hits++;
+    if (this.refresh) {
+      this.map.delete(key);
+      e.seen = Date.now();
+      this.map.set(key, e);
+    }
+    return e.value;
+  }
+
+  // Lookup without touching recency or the counters
+  has(key) {
+    const e = this.map.get(key);
+    return !!e && this.live(e, Date.now());
+  }
+
+  // get() without touching recency or the counters, for hot read-only loops
+  peek(key, now = Date.now()) {
+    const e = this.map.get(key);
+    return e && this.live(e, now) ? e.value : undefined;
+  }
+
+  // `seen` may be back-dated (e.g. on restore) as long as calls stay in time order
+  set(key, value, seen = Date.now()) {
+    this.map.delete(key);
+    this.map.set(key, { value, seen });
+    while (this.map.size > this.max) this.evict(this.map.keys().next().value);
+    return this;
+  }
+
+  delete(key) {
+    return this.map.delete(key);
+  }
+
+  evict(key) {
+    this.map.delete(key);
+    this.evictions++;
+  }
+
+  prune(now = Date.now()) {
+    for (const [key, e] of this.map) {
+      if (this.live(e, now)) break;
+      this.evict(key);
+    }
+  }
+
+  *[Symbol.iterator]() {
+    const now = Date.now();
+    for (const [key, e] of this.map) if (this.live(e, now)) yield [key, e.value];
+  }
+
+  stats() {
+    return { size: this.map.size, hits: this.hits, misses: this.misses, evictions: this.evictions };
+  }
+}
+
+const stateCacheOpts = { max: Number(STATE_CACHE_MAX), ttlMs: Number(STATE_TTL_HOURS) * 3_600_000 };
 
 const bot = new TelegramBot(TELEGRAM_TOKEN);
-let lastPinnedId     = null;
-let prevRankMap      = {};
-let prevH24Vol       = {};
-let alertedPools     = new Map();
-const launchPriceCache = new Map(); // address -> USD open price at pool launch
+const poolSeries       = new BoundedCache(stateCacheOpts); // address -> PoolSeries
+const launchPriceCache = new BoundedCache(stateCacheOpts); // address -> USD open price at pool launch
+
+// address -> alert time. Only has()/set() are used, so map order is alert order
+// and prune() drops expired entries from the head in O(expired).
+const alertedPools = new BoundedCache({
+  max:   Number(STATE_CACHE_MAX),
+  ttlMs: Number(ALERT_DEDUPE_HOURS) * 3_600_000,
+});
+
+function cacheStats() {
+  return {
+    series:      poolSeries.stats(),
+    launchPrice: launchPriceCache.stats(),
+    alerted:     alertedPools.stats(),
+    gecko:       { ...geckoCache.stats(), coalesced: geckoCoalesced },
+    symbols:     tokenSymbols.stats(),
+    token0:      poolToken0.stats(),
+    decimals:    tokenDecimals.stats(),
+  };
+}
 
 const CHAIN_NATIVE = 'WBESC';
+const GT_API       = 'https://api.geckoterminal.com/api/v2/networks/besc-hyperchain';
 
 // Bridged external assets — when these are the base with WBESC as quote,
 // the pair is indexed backwards and gets flipped + moved to a price-reference section
@@ -33,15 +184,388 @@ const BLOCKED_SET = new Set(
   BLOCKED_TOKENS.split(',').map(t => t.trim().toUpperCase()).filter(Boolean)
 );
 
+// ─── Pool time series ──────────────────────────────────────────────────────────
+// The last SERIES_LENGTH rows of price, liquidity, h24 volume, rank and fetch
+// time for each native pool, interleaved in one Float64Array ring, so memory per
+// pool is fixed. Price and volume also keep an EWMA level, slope (EWMA of the
+// per-cycle rate of change) and acceleration (EWMA of slope changes), each
+// updated in O(1) per push. Rows can be several cycles apart for pools only the
+// discovery crawl refreshes, so rates are divided by the cycles elapsed and the
+// EWMA weight grows with the gap.
+
+const SERIES_FIELDS = { price: 0, liq: 1, vol: 2, rank: 3, at: 4 }; // at: fetch time, ms
+const SERIES_WIDTH  = 5;
+const TREND_FIELDS  = [SERIES_FIELDS.price, SERIES_FIELDS.vol];
+const CYCLE_MS      = Number(POLL_INTERVAL_MINUTES) * 60_000;
+
+class PoolSeries {
+  constructor(length = Number(SERIES_LENGTH)) {
+    this.length = length;
+    this.count  = 0;
+    this.head   = 0; // next slot to write
+    this.data   = new Float64Array(length * SERIES_WIDTH);
+    this.ewma   = new Float64Array(SERIES_WIDTH); // indexed by SERIES_FIELDS, TREND_FIELDS only
+    this.slope  = new Float64Array(SERIES_WIDTH);
+    this.accel  = new Float64Array(SERIES_WIDTH);
+  }
+
+  push(row, alpha = Number(SERIES_EWMA_ALPHA)) {
+    const prev = ((this.head - 1 + this.length) % this.length) * SERIES_WIDTH;
+    const at   = this.head * SERIES_WIDTH;
+    const dt   = this.count ? (row[SERIES_FIELDS.at] - this.data[prev + SERIES_FIELDS.at]) / CYCLE_MS : 0;
+
+    for (const f of TREND_FIELDS) {
+      const v = row[f];
+      if (!this.count) {
+        this.ewma[f] = v;
+      } else if (dt > 0) {
+        const a       = 1 - (1 - alpha) ** dt; // weight of a row dt cycles after the last
+        const slope   = a * (v - this.data[prev + f]) / dt + (1 - a) * this.slope[f];
+        this.accel[f] = a * (slope - this.slope[f]) / dt  + (1 - a) * this.accel[f];
+        this.slope[f] = slope;
+        this.ewma[f]  = a * v + (1 - a) * this.ewma[f];
+      }
+    }
+    for (let f = 0; f < SERIES_WIDTH; f++) this.data[at + f] = row[f];
+    this.head  = (this.head + 1) % this.length;
+    this.count = Math.min(this.count + 1, this.length);
+  }
+
+  // Value of `field` k cycles ago (0 = latest), undefined past the window
+  at(field, k = 0) {
+    if (k >= this.count) return undefined;
+    const slot = (this.head - 1 - k + this.length * 2) % this.length;
+    return this.data[slot * SERIES_WIDTH + SERIES_FIELDS[field]];
+  }
+
+  // Rows oldest-first, for snapshots
+  rows() {
+    const out = [];
+    for (let k = this.count - 1; k >= 0; k--)
+      out.push(Object.keys(SERIES_FIELDS).map(field => this.at(field, k)));
+    return out;
+  }
+}
+
+function recordSeries(addr, row) {
+  let s = poolSeries.get(addr);
+  if (!s) poolSeries.set(addr, s = new PoolSeries());
+  s.push(row);
+}
+
+// ─── Chats ─────────────────────────────────────────────────────────────────────
+// TELEGRAM_CHATS="id[:size[:TOKEN|TOKEN]],..." fans one ranked snapshot out to
+// several groups. Each chat keeps its own pinned board, rank deltas, board size
+// and blocked list (BLOCKED_TOKENS unless given). Without it the bot serves
+// TELEGRAM_CHAT_ID alone with TRENDING_SIZE.
+
+function parseChats() {
+  const specs = TELEGRAM_CHATS ? TELEGRAM_CHATS.split(',') : [TELEGRAM_CHAT_ID];
+  return specs.map(s => s.trim()).filter(Boolean).map(spec => {
+    const [id, size, blocked] = spec.split(':').map(t => t.trim());
+    return {
+      id,
+      size:      Number(size || TRENDING_SIZE),
+      blocked:   blocked === undefined
+        ? BLOCKED_SET
+        : new Set(blocked.split('|').map(t => t.trim().toUpperCase()).filter(Boolean)),
+      pinnedId:  null,
+      prevRanks: {}, // address -> rank on this chat's previous board
+      lastBoard: null,
+    };
+  });
+}
+
+const chats = parseChats();
+
 // ─── Helpers ──────────────────────────────────────────────────────────────────
 
 function isBridgePair(p) {
-  const parts = (p.attributes.name || '').split('/').map(s => s.trim());
-  return FLIP_IF_BASE.test(parts[0]) && parts[1] === CHAIN_NATIVE;
+  return p.flipped;
+}
+
+const sleep = ms => new Promise(r => setTimeout(r, ms));
+
+// Runs fn over items with at most `limit` calls in flight, preserving order
+async function mapLimit(items, limit, fn) {
+  const results = new Array(items.length);
+  let next = 0;
+  const worker = async () => {
+    while (next < items.length) {
+      const i = next++;
+      results[i] = await fn(items[i], i);
+    }
+  };
+  await Promise.all(Array.from({ length: Math.min(Math.max(1, limit), items.length) }, worker));
+  return results;
+}
+
+// ─── Metrics ───────────────────────────────────────────────────────────────────
+// Prometheus text exposition at :METRICS_PORT/metrics (off when unset). Counters
+// and histograms are updated where the work happens; gauges are read from live
+// state at scrape time.
+
+const registry = [];
+
+function labelStr(labels) {
+  const parts = Object.entries(labels)
+    .map(([k, v]) => `${k}="${String(v).replace(/[\\"]/g, '\\$&').replace(/\n/g, '\\n')}"`);
+  return parts.length ? `{${parts.join(',')}}` : '';
+}
+
+class Counter {
+  constructor(name, help) {
+    this.name   = name;
+    this.help   = help;
+    this.values = new Map(); // label string -> count
+    registry.push(this);
+  }
+
+  inc(labels = {}, n = 1) {
+    const key = labelStr(labels);
+    this.values.set(key, (this.values.get(key) ?? 0) + n);
+  }
+
+  render() {
+    return [
+      `# HELP ${this.name} ${this.help}`,
+      `# TYPE ${this.name} counter`,
+      ...[...this.values].map(([key, v]) => `${this.name}${key} ${v}`),
+    ];
+  }
+}
+
+class Histogram {
+  constructor(name, help, buckets) {
+    this.name    = name;
+    this.help    = help;
+    this.buckets = buckets;
+    this.series  = new Map(); // label string -> { labels, counts, sum, count }
+    registry.push(this);
+  }
+
+  observe(labels, value) {
+    const key = labelStr(labels);
+    let s = this.series.get(key);
+    if (!s) this.series.set(key, s = { labels, counts: new Float64Array(this.buckets.length), sum: 0, count: 0 });
+    const i = this.buckets.findIndex(le => value <= le);
+    if (i >= 0) s.counts[i]++;
+    s.sum += value;
+    s.count++;
+  }
+
+  // Starts a timer; calling the result records the elapsed seconds
+  start(labels) {
+    const t0 = performance.now();
+    return () => this.observe(labels, (performance.now() - t0) / 1000);
+  }
+
+  render() {
+    const lines = [`# HELP ${this.name} ${this.help}`, `# TYPE ${this.name} histogram`];
+    for (const s of this.series.values()) {
+      let cum = 0;
+      this.buckets.forEach((le, i) => {
+        cum += s.counts[i];
+        lines.push(`${this.name}_bucket${labelStr({ ...s.labels, le })} ${cum}`);
+      });
+      lines.push(`${this.name}_bucket${labelStr({ ...s.labels, le: '+Inf' })} ${s.count}`);
+      lines.push(`${this.name}_sum${labelStr(s.labels)} ${s.sum}`);
+      lines.push(`${this.name}_count${labelStr(s.labels)} ${s.count}`);
+    }
+    return lines;
+  }
+}
+
+// collect() returns [labels, value] pairs; type is 'counter' for totals kept elsewhere
+class Gauge {
+  constructor(name, help, collect, type = 'gauge') {
+    this.name    = name;
+    this.help    = help;
+    this.collect = collect;
+    this.type    = type;
+    registry.push(this);
+  }
+
+  render() {
+    return [
+      `# HELP ${this.name} ${this.help}`,
+      `# TYPE ${this.name} ${this.type}`,
+      ...this.collect().map(([labels, v]) => `${this.name}${labelStr(labels)} ${v}`),
+    ];
+  }
+}
+
+const STAGE_BUCKETS   = [0.001, 0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120];
+const REQUEST_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30];
+
+const stageSeconds = new Histogram('trending_stage_seconds',
+  'Trending cycle stage duration: render and publish per chat, alerts per message, launch per ' +
+  'background lookup; publish includes send-queue and rate-limit waits, alerts rate-limit waits', STAGE_BUCKETS);
+const geckoSeconds = new Histogram('trending_gecko_request_seconds',
+  'GeckoTerminal request latency per attempt', REQUEST_BUCKETS);
+const geckoErrors  = new Counter('trending_gecko_request_errors_total',
+  'Failed GeckoTerminal request attempts');
+const tgSeconds    = new Histogram('trending_telegram_request_seconds',
+  'Telegram Bot API request latency per attempt', REQUEST_BUCKETS);
+const tgErrors     = new Counter('trending_telegram_request_errors_total',
+  'Failed Telegram Bot API request attempts');
+
+const loopDelay = monitorEventLoopDelay({ resolution: 20 });
+
+// Read at scrape time, so the state they reference may be declared further down
+new Gauge('trending_pools', 'Candidate pools per filter outcome in the last fresh cycle',
+  () => Object.entries(filterCounts).map(([reason, n]) => [{ reason }, n]));
+new Gauge('trending_cache_entries', 'Entries held per bounded cache',
+  () => Object.entries(cacheStats()).map(([cache, st]) => [{ cache }, st.size]));
+for (const field of ['hits', 'misses', 'evictions']) {
+  new Gauge(`trending_cache_${field}_total`, `Bounded cache ${field}`,
+    () => Object.entries(cacheStats()).map(([cache, st]) => [{ cache }, st[field]]), 'counter');
+}
+new Gauge('trending_gecko_coalesced_total', 'GeckoTerminal reads that joined an in-flight request',
+  () => [[{}, geckoCoalesced]], 'counter');
+new Gauge('trending_send_queue_pending', 'Telegram sends waiting in the queue',
+  () => [[{}, sendQueue.pending]]);
+new Gauge('trending_source_breaker_state', 'GeckoTerminal circuit breaker state (1 = current)',
+  () => ['closed', 'open', 'half-open'].map(state => [{ state }, sourceBreaker.state === state ? 1 : 0]));
+// schedule() stats of the board cycle and the alert poll (null when disabled)
+const loops = () => [['board', boardLoop], ['alert', alertLoop]].filter(([, st]) => st);
+new Gauge('trending_loop_runs_total', 'Completed scheduler runs',
+  () => loops().map(([loop, st]) => [{ loop }, st.runs]), 'counter');
+new Gauge('trending_loop_skipped_total', 'Scheduler ticks skipped because a run overran',
+  () => loops().map(([loop, st]) => [{ loop }, st.skipped]), 'counter');
+new Gauge('trending_loop_last_seconds', 'Duration of the latest scheduler run',
+  () => loops().map(([loop, st]) => [{ loop }, st.lastMs / 1000]));
+new Gauge('trending_loop_max_seconds', 'Longest scheduler run since start',
+  () => loops().map(([loop, st]) => [{ loop }, st.maxMs / 1000]));
+new Gauge('trending_event_loop_lag_seconds', 'Event-loop delay since the previous scrape',
+  () => [
+    [{ stat: 'mean' }, loopDelay.mean / 1e9],
+    [{ stat: 'p50' },  loopDelay.percentile(50) / 1e9],
+    [{ stat: 'p99' },  loopDelay.percentile(99) / 1e9],
+    [{ stat: 'max' },  loopDelay.max / 1e9],
+  ]);
+
+function serveMetrics(port) {
+  loopDelay.enable();
+  http.createServer((req, res) => {
+    if (req.method !== 'GET' || req.url !== '/metrics') {
+      res.writeHead(404).end();
+      return;
+    }
+    const body = registry.flatMap(m => m.render()).join('\n') + '\n';
+    loopDelay.reset(); // lag gauges cover the interval between scrapes
+    res.writeHead(200, { 'Content-Type': 'text/plain; version=0.0.4' }).end(body);
+  }).listen(port, () => console.log(`[TrendingBot] Metrics on :${port}/metrics`));
+}
+
+// ─── State persistence ─────────────────────────────────────────────────────────
+// Ranks, volumes, alerts, launch prices and pinned message ids survive
+// restarts through an append-only JSON-lines log (one event per line):
+//   { k: 'launch', a, v }            launch price learned for pool a
+//   { k: 'alert',  a, t }            pool a alerted at t
+//   { k: 'cycle',  rows, chats }     end-of-cycle series rows and per-chat pin/ranks
+//   { k: 'snapshot', ... }           full state; compaction rewrites the file as one
+// Any object with load/append/compact can replace the file store; STATE_FILE=''
+// disables persistence.
+
+function createFileStore(file) {
+  fs.mkdirSync(path.dirname(file), { recursive: true });
+  return {
+    load() {
+      if (!fs.existsSync(file)) return [];
+      const events = [];
+      for (const line of fs.readFileSync(file, 'utf8').split('\n')) {
+        if (!line) continue;
+        try { events.push(JSON.parse(line)); } catch { /* torn write at crash time */ }
+      }
+      return events;
+    },
+    append(event) {
+      fs.appendFileSync(file, JSON.stringify(event) + '\n');
+    },
+    compact(event) {
+      fs.writeFileSync(`${file}.tmp`, JSON.stringify(event) + '\n');
+      fs.renameSync(`${file}.tmp`, file);
+    },
+  };
+}
+
+const nullStore  = { load: () => [], append() {}, compact() {} };
+const stateStore = STATE_FILE ? createFileStore(STATE_FILE) : nullStore;
+let lastCompact  = Date.now();
+
+function persist(event) {
+  try {
+    stateStore.append(event);
+  } catch (e) {
+    console.error('[TrendingBot] State write failed:', e.message);
+  }
+}
+
+function applyStateEvent(e) {
+  switch (e.k) {
+    case 'launch': launchPriceCache.set(e.a, e.v); break;
+    case 'alert':  alertedPools.set(e.a, e.t, e.t); break;
+    case 'cycle':
+      for (const [a, row] of Object.entries(e.rows || {})) recordSeries(a, row);
+      restoreChats(e.chats);
+      break;
+    case 'snapshot':
+      for (const [a, rows] of e.series || []) for (const row of rows) recordSeries(a, row);
+      restoreChats(e.chats);
+      for (const [a, v] of e.launch || []) launchPriceCache.set(a, v);
+      for (const [a, t] of e.alerts || []) alertedPools.set(a, t, t);
+      break;
+  }
+}
+
+function restoreChats(saved = {}) {
+  for (const chat of chats) {
+    const c = saved[chat.id];
+    if (!c) continue;
+    chat.pinnedId  = c.pin ?? chat.pinnedId;
+    chat.prevRanks = c.ranks || {};
+  }
+}
+
+function chatState() {
+  return Object.fromEntries(chats.map(c => [c.id, { pin: c.pinnedId, ranks: c.prevRanks }]));
+}
+
+function restoreState() {
+  try {
+    const events = stateStore.load();
+    for (const e of events) applyStateEvent(e);
+    if (events.length)
+      console.log(`[TrendingBot] Restored state: ${launchPriceCache.size} launch prices, ${alertedPools.size} alerts, ${chats.filter(c => c.pinnedId).length}/${chats.length} pinned boards`);
+  } catch (e) {
+    console.error('[TrendingBot] State restore failed:', e.message);
+  }
+}
+
+// Folds the log into a single snapshot line every STATE_SNAPSHOT_MINUTES
+function maybeCompactState() {
+  if (Date.now() - lastCompact < Number(STATE_SNAPSHOT_MINUTES) * 60_000) return;
+  lastCompact = Date.now();
+  try {
+    stateStore.compact({
+      k:      'snapshot',
+      t:      Date.now(),
+      series: [...poolSeries].map(([a, s]) => [a, s.rows()]),
+      chats:  chatState(),
+      launch: [...launchPriceCache],
+      alerts: [...alertedPools],
+    });
+  } catch (e) {
+    console.error('[TrendingBot] State snapshot failed:', e.message);
+  }
 }
 
 // ─── Formatters ───────────────────────────────────────────────────────────────
 
+// For text from outside the bot (e.g. on-chain token symbols) in parse_mode HTML
+const escapeHtml = s => s.replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
+
 // Use UTC getters directly — toLocaleTimeString with hour12:false shows "24:xx" at midnight
 function fmtTime() {
   const d = new Date();
@@ -81,7 +605,7 @@ function moodEmoji(chgM5, chgH1) {
 }
 
 function ageStr(createdAt) {
-  const ms = Date.now() - new Date(createdAt).getTime();
+  const ms = Date.now() - createdAt;
   const m  = Math.floor(ms / 60000);
   if (m < 60) return `${m}m`;
   const h = ms / 3_600_000;
@@ -93,194 +617,1238 @@ function rankBadge(i) {
   return ['🥇', '🥈', '🥉'][i] ?? `<b>${i + 1}.</b>`;
 }
 
+// ─── Pool snapshot ─────────────────────────────────────────────────────────────
+// Raw GeckoTerminal pool objects are parsed once in fetchPools into a flat
+// snapshot; everything downstream reads these fields and the raw JSON is dropped.
+
+// "besc-hyperchain_0xabc…" -> "0xabc…"
+const tokenAddress = rel => rel?.data?.id?.split('_').pop().toLowerCase() ?? null;
+
+function normalizePool(p) {
+  const a     = p.attributes;
+  const parts = (a.name || '').split('/').map(s => s.trim());
+  const base  = parts[0] || '';
+  const quote = parts[1] || '';
+  const vol   = a.volume_usd || {};
+  const chg   = a.price_change_percentage || {};
+  const tx    = a.transactions || {};
+
+  return {
+    address:    (a.address || '').toLowerCase(), // on-chain logs are lowercase
+    name:       a.name || '',
+    base,
+    quote,
+    baseToken:  tokenAddress(p.relationships?.base_token),
+    quoteToken: tokenAddress(p.relationships?.quote_token),
+    symbol:     base.toUpperCase(),
+    flipped:    FLIP_IF_BASE.test(base) && quote === CHAIN_NATIVE,
+    createdAt:  new Date(a.pool_created_at).getTime(),
+    fetchedAt:  Date.now(),
+    liq:        Number(a.reserve_in_usd || 0),
+    priceBase:  Number(a.base_token_price_usd  || 0),
+    priceQuote: Number(a.quote_token_price_usd || 0),
+    mc:         Number(a.market_cap_usd || a.fdv_usd || 0),
+    volM5:      Number(vol.m5  || 0),
+    volH1:      Number(vol.h1  || 0),
+    volH24:     Number(vol.h24 || 0),
+    chgM5:      Number(chg.m5  || 0),
+    chgH1:      Number(chg.h1  || 0),
+    chgH24:     Number(chg.h24 || 0),
+    buysM5:     tx.m5?.buys   || 0,
+    buysH1:     tx.h1?.buys   || 0,
+    sellsH1:    tx.h1?.sells  || 0,
+    buysH24:    tx.h24?.buys  || 0,
+    sellsH24:   tx.h24?.sells || 0,
+  };
+}
+
 // ─── Pair orientation ──────────────────────────────────────────────────────────
 
 function getPairView(p) {
-  const a         = p.attributes;
-  const parts     = (a.name || '').split('/').map(s => s.trim());
-  const baseName  = parts[0] || '';
-  const quoteName = parts[1] || '';
-  const flipped   = FLIP_IF_BASE.test(baseName) && quoteName === CHAIN_NATIVE;
-
-  if (flipped) {
-    const inv = x => -(Number(x) || 0);
+  if (p.flipped) {
     return {
-      name:    `${CHAIN_NATIVE} / ${baseName}`,
-      partner: baseName,
-      price:   a.quote_token_price_usd,
+      name:    `${CHAIN_NATIVE} / ${p.base}`,
+      partner: p.base,
+      price:   p.priceQuote,
       mc:      null,
-      chgM5:   inv(a.price_change_percentage?.m5),
-      chgH1:   inv(a.price_change_percentage?.h1),
-      chgH24:  inv(a.price_change_percentage?.h24),
-      buysH1:  a.transactions?.h1?.sells || 0,
-      sellsH1: a.transactions?.h1?.buys  || 0,
-      volH1:   Number(a.volume_usd?.h1  || 0),
-      volH24:  Number(a.volume_usd?.h24 || 0),
+      chgM5:   -p.chgM5,
+      chgH1:   -p.chgH1,
+      chgH24:  -p.chgH24,
+      buysH1:  p.sellsH1,
+      sellsH1: p.buysH1,
+      volH1:   p.volH1,
+      volH24:  p.volH24,
     };
   }
 
   return {
-    name:    a.name,
+    name:    p.name,
     partner: null,
-    price:   a.base_token_price_usd,
-    mc:      a.market_cap_usd || a.fdv_usd,
-    chgM5:   Number(a.price_change_percentage?.m5  || 0),
-    chgH1:   Number(a.price_change_percentage?.h1  || 0),
-    chgH24:  Number(a.price_change_percentage?.h24 || 0),
-    buysH1:  a.transactions?.h1?.buys  || 0,
-    sellsH1: a.transactions?.h1?.sells || 0,
-    volH1:   Number(a.volume_usd?.h1  || 0),
-    volH24:  Number(a.volume_usd?.h24 || 0),
+    price:   p.priceBase,
+    mc:      p.mc,
+    chgM5:   p.chgM5,
+    chgH1:   p.chgH1,
+    chgH24:  p.chgH24,
+    buysH1:  p.buysH1,
+    sellsH1: p.sellsH1,
+    volH1:   p.volH1,
+    volH24:  p.volH24,
   };
 }
 
 // ─── Pool quality filter ───────────────────────────────────────────────────────
 
-function isGoodPool(p) {
-  const baseName = (p.attributes.name || '').split('/')[0].trim().toUpperCase();
-  if (STABLE_RE.test(baseName))  return false;
-  if (BLOCKED_SET.has(baseName)) return false;
+// Why a pool is left off the boards, or null when it qualifies
+function rejectReason(p) {
+  if (STABLE_RE.test(p.symbol)) return 'stable';
+  if (p.liq < Number(MIN_LIQ)) return 'low_liquidity';
+  if (p.buysH24 + p.sellsH24 + p.buysH1 + p.buysM5 < 1) return 'inactive';
 
-  const a     = p.attributes;
-  const liq   = Number(a.reserve_in_usd || 0);
-  const txH24 = a.transactions?.h24 || {};
-  const txH1  = a.transactions?.h1  || {};
-  const txM5  = a.transactions?.m5  || {};
+  return null;
+}
 
-  if (liq < Number(MIN_LIQ)) return false;
-  if ((txH24.buys || 0) + (txH24.sells || 0) + (txH1.buys || 0) + (txM5.buys || 0) < 1) return false;
+function isGoodPool(p) {
+  return rejectReason(p) === null;
+}
+
+// Candidates per outcome in the last fresh cycle ('ok' for pools kept)
+let filterCounts = {};
 
-  return true;
+function filterPools(pools) {
+  const counts = { ok: 0, stable: 0, low_liquidity: 0, inactive: 0 };
+  const good   = [];
+  for (const p of pools) {
+    const reason = rejectReason(p);
+    counts[reason ?? 'ok']++;
+    if (!reason) good.push(p);
+  }
+  filterCounts = counts;
+  return good;
 }
 
 // ─── Hotness score ─────────────────────────────────────────────────────────────
+// Candidates are packed into Float64Array columns once per cycle. Each score
+// term is a tight loop over those columns that fills its own component column,
+// and the score is the sum of the components — a new term is one more entry in
+// SCORE_TERMS.
+
+const SCORE_COLUMNS = [
+  'volM5', 'volH1', 'volH24', 'chgM5', 'chgH1', 'buys', 'sells', 'ageH', 'prevVol', 'gap', 'pxVel', 'volAccel',
+];
+
+function packColumns(pools, now) {
+  const n    = pools.length;
+  const cols = { n };
+  for (const name of SCORE_COLUMNS) cols[name] = new Float64Array(n);
+
+  for (let i = 0; i < n; i++) {
+    const p = pools[i];
+    cols.volM5[i]   = p.volM5;
+    cols.volH1[i]   = p.volH1;
+    cols.volH24[i]  = p.volH24;
+    cols.chgM5[i]   = Math.abs(p.chgM5);
+    cols.chgH1[i]   = Math.abs(p.chgH1);
+    cols.buys[i]    = p.buysH1;
+    cols.sells[i]   = p.sellsH1;
+    cols.ageH[i]    = (now - p.createdAt) / 3_600_000;
+    // Snapshots between crawls can be a cycle or more old, so the h24 growth
+    // since the last row is scaled to cycles elapsed (0 = same snapshot)
+    const s      = poolSeries.peek(p.address, now); // recency is touched by recordSeries
+    const prevAt = s?.at('at');
+    cols.prevVol[i] = s?.at('vol') ?? p.volH24;
+    cols.gap[i]     = prevAt === undefined ? 1 : (p.fetchedAt - prevAt) / CYCLE_MS;
+    if (s) {
+      const px = SERIES_FIELDS.price;
+      cols.pxVel[i]    = s.ewma[px] > 0 ? s.slope[px] / s.ewma[px] * 100 : 0; // % per cycle
+      cols.volAccel[i] = s.accel[SERIES_FIELDS.vol];                          // USD per cycle²
+    }
+  }
+  return cols;
+}
 
-function hotness(p) {
-  const a       = p.attributes;
-  const volM5   = Number(a.volume_usd?.m5  || 0);
-  const volH1   = Number(a.volume_usd?.h1  || 0);
-  const volH24  = Number(a.volume_usd?.h24 || 0);
-  const chgM5   = Math.abs(Number(a.price_change_percentage?.m5 || 0));
-  const chgH1   = Math.abs(Number(a.price_change_percentage?.h1 || 0));
-  const txH1    = a.transactions?.h1 || {};
-  const buysH1  = txH1.buys  || 0;
-  const sellsH1 = txH1.sells || 0;
-  const totalH1 = buysH1 + sellsH1;
-
-  const h24avg      = volH24 / 24;
-  const accel       = h24avg > 50 ? volH1 / h24avg : 1;
-  const buyPressure = totalH1 > 0 ? buysH1 / totalH1 : 0.5;
-  const prevVol     = prevH24Vol[a.address] ?? volH24;
-  const burst       = Math.max(0, volH24 - prevVol);
-
-  const ageH     = (Date.now() - new Date(a.pool_created_at).getTime()) / 3_600_000;
-  const newBonus = ageH < 1 ? 3000 : ageH < 6 ? 800 : ageH < 12 ? 150 : 0;
+const SCORE_TERMS = {
+  volume(c, out) {
+    for (let i = 0; i < c.n; i++) out[i] = c.volM5[i] * 300 + c.volH1[i] * 20 + c.volH24[i] * 0.4;
+  },
+  burst(c, out) {
+    for (let i = 0; i < c.n; i++) out[i] = c.gap[i] > 0 ? Math.max(0, c.volH24[i] - c.prevVol[i]) * 10 / c.gap[i] : 0;
+  },
+  buys(c, out) {
+    for (let i = 0; i < c.n; i++) out[i] = c.buys[i] * 100;
+  },
+  momentum(c, out) {
+    for (let i = 0; i < c.n; i++) out[i] = c.chgM5[i] * c.volM5[i] * 0.2 + c.chgH1[i] * c.volH1[i] * 0.1;
+  },
+  accel(c, out) {
+    for (let i = 0; i < c.n; i++) {
+      const h24avg = c.volH24[i] / 24;
+      const accel  = h24avg > 50 ? c.volH1[i] / h24avg : 1;
+      out[i] = accel > 2 ? c.volH1[i] * 8 * Math.min(accel, 8) : 0;
+    }
+  },
+  pressure(c, out) {
+    for (let i = 0; i < c.n; i++) {
+      const total = c.buys[i] + c.sells[i];
+      const bp    = total > 0 ? c.buys[i] / total : 0.5;
+      out[i] = bp > 0.65 ? c.volH1[i] * 5 : 0;
+    }
+  },
+  // Smoothed price climb (% per cycle) weighted by the volume behind it
+  velocity(c, out) {
+    for (let i = 0; i < c.n; i++) out[i] = Math.max(0, c.pxVel[i]) * c.volH1[i] * 0.2;
+  },
+  // h24 volume growth that is itself speeding up
+  surge(c, out) {
+    for (let i = 0; i < c.n; i++) out[i] = Math.max(0, c.volAccel[i]) * 10;
+  },
+  newBonus(c, out) {
+    for (let i = 0; i < c.n; i++) {
+      const ageH = c.ageH[i];
+      out[i] = ageH < 1 ? 3000 : ageH < 6 ? 800 : ageH < 12 ? 150 : 0;
+    }
+  },
+};
+
+// Returns { address, score, pool, row } records sorted hottest-first. The
+// component breakdown stays columnar: ranked.parts[term][record.row].
+function rankPools(pools, now = Date.now()) {
+  const cols  = packColumns(pools, now);
+  const score = new Float64Array(cols.n);
+  const parts = {};
+
+  for (const [name, term] of Object.entries(SCORE_TERMS)) {
+    const out = parts[name] = new Float64Array(cols.n);
+    term(cols, out);
+    for (let i = 0; i < cols.n; i++) score[i] += out[i];
+  }
 
-  return (
-    volM5  * 300 +
-    volH1  * 20  +
-    volH24 * 0.4 +
-    burst  * 10  +
-    buysH1 * 100 +
-    chgM5  * volM5 * 0.2 +
-    chgH1  * volH1 * 0.1 +
-    (accel > 2 ? volH1 * 8 * Math.min(accel, 8) : 0) +
-    (buyPressure > 0.65 ? volH1 * 5 : 0) +
-    newBonus
-  );
+  const order  = new Uint32Array(cols.n).map((_, i) => i).sort((a, b) => score[b] - score[a]);
+  const ranked = Array.from(order, i => ({ address: pools[i].address, score: score[i], pool: pools[i], row: i }));
+  ranked.parts = parts;
+  return ranked;
+}
+
+// ─── Rate limiting ─────────────────────────────────────────────────────────────
+
+class TokenBucket {
+  constructor(ratePerSec, burst = 1) {
+    this.rate     = ratePerSec / 1000; // tokens per ms
+    this.capacity = Math.max(1, burst);
+    this.tokens   = this.capacity;
+    this.last     = Date.now();
+    this.tail     = Promise.resolve();
+  }
+
+  refill() {
+    const now   = Date.now();
+    this.tokens = Math.min(this.capacity, this.tokens + (now - this.last) * this.rate);
+    this.last   = now;
+  }
+
+  // Resolves once a token is available; waiters are served in FIFO order
+  take() {
+    const turn = this.tail.then(async () => {
+      this.refill();
+      while (this.tokens < 1) {
+        await sleep(Math.ceil((1 - this.tokens) / this.rate));
+        this.refill();
+      }
+      this.tokens -= 1;
+    });
+    this.tail = turn;
+    return turn;
+  }
+
+  // Holds every waiter back for at least ms (e.g. a server-sent Retry-After)
+  pause(ms) {
+    this.refill();
+    this.tokens = Math.min(this.tokens, 0) - ms * this.rate;
+  }
+}
+
+// ─── GeckoTerminal client ──────────────────────────────────────────────────────
+// One keep-alive client for every GeckoTerminal read. Each request takes a token
+// from the global bucket (public API: 30 calls/min) and from its endpoint's own
+// budget if one is configured in GECKO_BUDGETS ("endpoint:perMinute,..."). A
+// caller can draw from a named budget instead of its endpoint's (e.g. alerts).
+
+const gecko = axios.create({
+  baseURL:    GT_API,
+  timeout:    15000,
+  headers:    { Accept: 'application/json' },
+  httpsAgent: new https.Agent({ keepAlive: true, maxSockets: 4 }),
+});
+
+const geckoBucket  = new TokenBucket(Number(GECKO_RPM) / 60, Number(GECKO_BURST));
+const geckoBudgets = new Map(
+  GECKO_BUDGETS.split(',')
+    .map(s => s.split(':').map(t => t.trim()))
+    .filter(([name, rpm]) => name && Number(rpm) > 0)
+    .map(([name, rpm]) => [name, new TokenBucket(Number(rpm) / 60, 2)])
+);
+
+function endpointOf(path) {
+  if (path.includes('/ohlcv/'))         return 'ohlcv';
+  if (path.startsWith('/pools/multi/')) return 'multi';
+  return path.split('/')[1];
+}
+
+function retryAfterMs(header) {
+  if (header == null) return null;
+  const secs = Number(header);
+  if (Number.isFinite(secs)) return secs * 1000;
+  const at = Date.parse(header);
+  return Number.isFinite(at) ? Math.max(0, at - Date.now()) : null;
+}
+
+// Exponential backoff with "equal jitter": half fixed, half random
+function backoffMs(attempt) {
+  const ceil = Math.min(30_000, 1000 * 2 ** attempt);
+  return ceil / 2 + Math.random() * ceil / 2;
+}
+
+// ─── Request coalescing ─────────────────────────────────────────────────────────
+// Identical reads (same path and params) share one in-flight request, and a
+// successful response is served from cache for GECKO_CACHE_TTL_SECONDS, so extra
+// consumers — the alert loop, more chats — don't multiply upstream calls.
+// { fresh: true } skips the cache but still joins an in-flight request, for
+// pollers whose interval is as short as the TTL.
+
+const geckoCache    = new BoundedCache({ max: 500, ttlMs: Number(GECKO_CACHE_TTL_SECONDS) * 1000, refresh: false });
+const geckoInflight = new Map(); // request key -> Promise
+let geckoCoalesced  = 0;
+
+function requestKey(path, params) {
+  return `${path}?${Object.keys(params).sort().map(k => `${k}=${params[k]}`).join('&')}`;
+}
+
+function geckoGet(path, params = {}, opts = {}) {
+  const key    = requestKey(path, params);
+  const cached = opts.fresh ? undefined : geckoCache.get(key);
+  if (cached !== undefined) return Promise.resolve(cached);
+
+  const pending = geckoInflight.get(key);
+  if (pending) {
+    geckoCoalesced++;
+    return pending;
+  }
+
+  const req = geckoFetch(path, params, opts)
+    .then(data => {
+      geckoCache.set(key, data);
+      return data;
+    })
+    .finally(() => geckoInflight.delete(key));
+  geckoInflight.set(key, req);
+  return req;
+}
+
+async function geckoFetch(path, params, { timeout, budget: budgetName } = {}) {
+  const endpoint = budgetName ?? endpointOf(path);
+  const budget   = geckoBudgets.get(endpoint);
+
+  for (let attempt = 0; ; attempt++) {
+    await geckoBucket.take();
+    if (budget) await budget.take();
+
+    const done = geckoSeconds.start({ endpoint });
+    try {
+      const { data } = await gecko.get(path, { params, timeout });
+      done();
+      return data;
+    } catch (e) {
+      done();
+      const status    = e.response?.status;
+      geckoErrors.inc({ endpoint, status: status ?? e.code ?? 'network' });
+      const retryable = !status || status === 429 || status >= 500;
+      if (!retryable || attempt >= Number(GECKO_MAX_RETRIES)) throw e;
+
+      if (status === 429) {
+        // Throttle everyone, not just this caller — the limit is per client IP
+        const wait = retryAfterMs(e.response.headers?.['retry-after']) ?? backoffMs(attempt);
+        geckoBucket.pause(wait);
+        budget?.pause(wait);
+        console.warn(`[TrendingBot] GeckoTerminal 429 on ${endpoint}, backing off ${Math.round(wait)}ms`);
+      } else {
+        await sleep(backoffMs(attempt));
+      }
+    }
+  }
 }
 
 // ─── Fetch ─────────────────────────────────────────────────────────────────────
+// Every discovery source is paged sequentially so it can stop early; sources
+// themselves are crawled in parallel, at most FETCH_CONCURRENCY at a time.
+
+const GT_PAGE_SIZE = 20;
+const GT_MAX_PAGE  = 10; // GeckoTerminal rejects page > 10
+
+const DISCOVERY_SOURCES = [
+  ...DISCOVERY_SORTS.split(',').map(s => s.trim()).filter(Boolean)
+    .map(sort => ({ path: '/pools', sort })),
+  ...(DISCOVERY_NEW_POOLS === 'true' ? [{ path: '/new_pools' }] : []),
+];
+
+async function crawlSource(src) {
+  const maxPages = Math.min(Math.max(1, Number(DISCOVERY_PAGES)), GT_MAX_PAGE);
+  const pools    = [];
+
+  for (let page = 1; page <= maxPages; page++) {
+    const params = src.sort ? { sort: src.sort, page } : { page };
+    let raw;
+    try {
+      raw = (await geckoGet(src.path, params)).data || [];
+    } catch (e) {
+      if (page === 1) throw e;
+      console.error(`[TrendingBot] ${src.sort || src.path} page ${page} failed: ${e.message}`);
+      break;
+    }
+
+    const batch = raw.map(normalizePool);
+    pools.push(...batch);
 
+    if (raw.length < GT_PAGE_SIZE) break;                       // last page
+    if (!batch.some(p => p.liq >= Number(MIN_LIQ))) break;     // only dust from here on
+  }
+  return pools;
+}
+
+// All deduplicated candidates; the quality filter runs per cycle in postTrending.
+// Throws only when every source failed, so an outage never looks like a quiet chain
 async function fetchPools() {
-  const get = (params) =>
-    axios.get('https://api.geckoterminal.com/api/v2/networks/besc-hyperchain/pools', {
-      params, timeout: 15000,
-    }).then(r => r.data.data || []).catch(() => []);
-
-  const [byH24, byH1] = await Promise.all([
-    get({ sort: 'h24_volume_usd_desc', page: 1 }),
-    get({ sort: 'h1_volume_usd_desc',  page: 1 }),
-  ]);
+  const pages = await mapLimit(DISCOVERY_SOURCES, Number(FETCH_CONCURRENCY), src =>
+    crawlSource(src).catch(e => {
+      console.error(`[TrendingBot] Discovery ${src.sort || src.path} failed: ${e.message}`);
+      return null;
+    })
+  );
+  if (pages.every(p => p === null)) throw new Error('GeckoTerminal discovery failed');
+
+  const seen  = new Set();
+  const pools = [];
+  const refs  = [];
+  for (const p of pages.flat().filter(Boolean)) {
+    if (seen.has(p.address)) continue;
+    seen.add(p.address);
+    if (isUsdRefPool(p)) refs.push(p);
+    pools.push(p);
+  }
+  usdRefPools = refs.sort((a, b) => b.liq - a.liq).slice(0, 3);
+  return pools;
+}
 
-  const seen = new Set();
-  return [...byH24, ...byH1].filter(p => {
-    const addr = p.attributes.address;
-    if (seen.has(addr)) return false;
-    seen.add(addr);
-    return isGoodPool(p);
-  });
+// WBESC/stable pairs — the on-chain quoter prices WBESC in USD through these
+let usdRefPools = [];
+
+function isUsdRefPool(p) {
+  return (p.base === CHAIN_NATIVE && STABLE_RE.test(p.quote)) ||
+         (p.quote === CHAIN_NATIVE && STABLE_RE.test(p.base));
+}
+
+// ─── Tiered refresh ────────────────────────────────────────────────────────────
+// The full discovery crawl only runs every DISCOVERY_INTERVAL_MINUTES. In between,
+// board cycles refresh just the watchlist — pools shown on any board within the
+// last WATCH_TTL_MINUTES — through pools/multi (30 addresses per request), and
+// every other pool keeps its snapshot from the last crawl.
+
+const MULTI_BATCH = 30;
+
+let poolStore     = new Map(); // address -> latest snapshot
+let lastDiscovery = 0;
+const watchlist   = new BoundedCache({ ttlMs: Number(WATCH_TTL_MINUTES) * 60_000 });
+
+function watchPools(pools) {
+  for (const p of pools) watchlist.set(p.address, true);
+}
+
+// A failed batch only costs its pools this refresh — they keep the snapshot from
+// the last crawl, at most DISCOVERY_INTERVAL_MINUTES old
+async function fetchMulti(addresses) {
+  const batches = [];
+  for (let i = 0; i < addresses.length; i += MULTI_BATCH) batches.push(addresses.slice(i, i + MULTI_BATCH));
+  const pages = await mapLimit(batches, Number(FETCH_CONCURRENCY), batch =>
+    geckoGet(`/pools/multi/${batch.join(',')}`).catch(e => {
+      console.error(`[TrendingBot] pools/multi batch of ${batch.length} failed: ${e.message}`);
+      return {};
+    })
+  );
+  return pages.flatMap(d => (d.data || []).map(normalizePool));
+}
+
+async function refreshPools() {
+  if (Date.now() - lastDiscovery >= Number(DISCOVERY_INTERVAL_MINUTES) * 60_000) {
+    const pools = await fetchPools();
+    // An empty crawl after a populated one is an upstream glitch, not a quiet chain
+    if (!pools.length && poolStore.size) throw new Error('GeckoTerminal discovery returned no pools');
+    poolStore     = new Map(pools.map(p => [p.address, p]));
+    lastDiscovery = Date.now();
+    return pools;
+  }
+
+  watchlist.prune();
+  const hot = [...watchlist].map(([addr]) => addr);
+  if (hot.length) {
+    for (const p of await fetchMulti(hot)) poolStore.set(p.address, p);
+  }
+  return [...poolStore.values()];
+}
+
+// ─── Circuit breaker ───────────────────────────────────────────────────────────
+// Guards the GeckoTerminal data source. BREAKER_FAILURES consecutive failed
+// refreshes open it; while open, cycles don't call the API at all and boards keep
+// showing the last good snapshot marked stale. After BREAKER_COOLDOWN_MINUTES one
+// cycle is let through as a half-open probe: success closes the breaker, failure
+// re-opens it for another cooldown.
+
+class CircuitBreaker {
+  constructor(name, { failures, cooldownMs }) {
+    this.name       = name;
+    this.failures   = failures;
+    this.cooldownMs = cooldownMs;
+    this.state      = 'closed';
+    this.fails      = 0;
+    this.openedAt   = 0;
+  }
+
+  // True when a request may go out; moves open -> half-open once cooled down
+  allow() {
+    if (this.state === 'closed') return true;
+    if (this.state === 'open' && Date.now() - this.openedAt >= this.cooldownMs) {
+      this.state = 'half-open';
+      console.log(`[TrendingBot] ${this.name} breaker half-open, probing`);
+      return true;
+    }
+    return false;
+  }
+
+  success() {
+    if (this.state !== 'closed') console.log(`[TrendingBot] ${this.name} breaker closed`);
+    this.state = 'closed';
+    this.fails = 0;
+  }
+
+  failure() {
+    this.fails++;
+    if (this.state === 'half-open' || (this.state === 'closed' && this.fails >= this.failures)) {
+      this.state    = 'open';
+      this.openedAt = Date.now();
+      console.warn(`[TrendingBot] ${this.name} breaker open for ${Math.round(this.cooldownMs / 60_000)}m after ${this.fails} failure(s)`);
+    }
+  }
+}
+
+const sourceBreaker = new CircuitBreaker('GeckoTerminal', {
+  failures:   Math.max(1, Number(BREAKER_FAILURES)),
+  cooldownMs: Number(BREAKER_COOLDOWN_MINUTES) * 60_000,
+});
+
+// { nativePools, bridgePools, at } from the last cycle that refreshed successfully
+let lastGood = null;
+
+// Fresh pools, or null when the breaker is open or the refresh failed
+async function loadPools() {
+  if (!sourceBreaker.allow()) return null;
+  try {
+    const pools = await refreshPools();
+    sourceBreaker.success();
+    return pools;
+  } catch (e) {
+    sourceBreaker.failure();
+    console.error('[TrendingBot] Pool refresh failed:', e.message);
+    return null;
+  }
 }
 
 // ─── Launch price cache ────────────────────────────────────────────────────────
 // Only for native tokens — bridge pair OHLCV tracks the external asset, not WBESC
 
-async function fetchLaunchPrices(nativePools) {
-  const needed = nativePools.filter(p => !launchPriceCache.has(p.attributes.address));
+// Missing prices are resolved by a background queue so posting never waits on
+// OHLCV. The queue is rebuilt in rank order every cycle, so trending pools are
+// looked up first and pools that dropped off the list are forgotten.
 
-  for (const p of needed.slice(0, 5)) {
-    const addr = p.attributes.address;
-    try {
-      const { data } = await axios.get(
-        `https://api.geckoterminal.com/api/v2/networks/besc-hyperchain/pools/${addr}/ohlcv/hour`,
-        { params: { limit: 1000, currency: 'usd' }, timeout: 10000 }
-      );
-      const list = (data.data?.attributes?.ohlcv_list || [])
-        .slice()
-        .sort((a, b) => a[0] - b[0]); // ascending — oldest candle first
-      if (list.length && list[0][1] > 0) {
-        launchPriceCache.set(addr, list[0][1]);
-        console.log(`[TrendingBot] Launch price: ${p.attributes.name} = $${list[0][1]}`);
-      }
-    } catch (e) {
-      console.error(`[TrendingBot] OHLCV failed for ${addr}: ${e.message}`);
+const launchQueue  = new Map(); // address -> pool snapshot, in rank order
+const launchActive = new Set();
+
+function queueLaunchPrices(nativePools) {
+  launchQueue.clear();
+  for (const p of nativePools) {
+    // get() rather than has() so every pool still listed counts as seen
+    if (launchPriceCache.get(p.address) !== undefined || launchActive.has(p.address)) continue;
+    launchQueue.set(p.address, p);
+  }
+  drainLaunchQueue();
+}
+
+function drainLaunchQueue() {
+  while (launchActive.size < Number(LAUNCH_CONCURRENCY) && launchQueue.size) {
+    const [addr, p] = launchQueue.entries().next().value;
+    launchQueue.delete(addr);
+    launchActive.add(addr);
+    fetchLaunchPrice(p).finally(() => {
+      launchActive.delete(addr);
+      drainLaunchQueue();
+    });
+  }
+}
+
+// Only the first candle matters, so ask for a short window just after
+// pool_created_at instead of the whole history. The starting timeframe follows
+// pool age; if its window holds no trades, retry one timeframe coarser.
+
+const LAUNCH_WINDOW = 24; // candles per lookup
+
+const OHLCV_TIMEFRAMES = [
+  { timeframe: 'minute', secs: 60,     maxAgeSecs: 86_400 },
+  { timeframe: 'hour',   secs: 3600,   maxAgeSecs: 30 * 86_400 },
+  { timeframe: 'day',    secs: 86_400, maxAgeSecs: Infinity },
+];
+
+function oldestCandle(list) {
+  let oldest = null;
+  for (const c of list) if (!oldest || c[0] < oldest[0]) oldest = c;
+  return oldest;
+}
+
+async function fetchLaunchOpen(p) {
+  const created = Math.floor(p.createdAt / 1000);
+  const ageSecs = Date.now() / 1000 - created;
+  const first   = Number.isFinite(ageSecs)
+    ? OHLCV_TIMEFRAMES.findIndex(t => ageSecs < t.maxAgeSecs)
+    : OHLCV_TIMEFRAMES.length - 1;
+
+  for (let i = first; i < OHLCV_TIMEFRAMES.length; i++) {
+    const { timeframe, secs } = OHLCV_TIMEFRAMES[i];
+    // Daily candles are coarse enough to take the full history (one row per day)
+    const params = timeframe === 'day'
+      ? { limit: 1000, currency: 'usd' }
+      : { limit: LAUNCH_WINDOW, currency: 'usd', before_timestamp: created + LAUNCH_WINDOW * secs };
+
+    const data   = await geckoGet(`/pools/${p.address}/ohlcv/${timeframe}`, params, { timeout: 10000 });
+    const candle = oldestCandle(data.data?.attributes?.ohlcv_list || []);
+    if (candle) return candle[1];
+  }
+  return null;
+}
+
+async function fetchLaunchPrice(p) {
+  const done = stageSeconds.start({ stage: 'launch' });
+  try {
+    const open = await fetchLaunchOpen(p);
+    if (open > 0) {
+      launchPriceCache.set(p.address, open);
+      persist({ k: 'launch', a: p.address, v: open });
+      console.log(`[TrendingBot] Launch price: ${p.name} = $${open}`);
     }
-    await new Promise(r => setTimeout(r, 200));
+  } catch (e) {
+    console.error(`[TrendingBot] OHLCV failed for ${p.address}: ${e.message}`);
   }
+  done();
 }
 
 // ─── New pool alerts ───────────────────────────────────────────────────────────
+// Up to ALERT_DIGEST_THRESHOLD launches per cycle get one message each; a bigger
+// wave is folded into a single digest per chat (at most ALERT_DIGEST_MAX rows).
 
-async function sendNewPoolAlerts(pools) {
-  for (const [addr, ts] of alertedPools)
-    if (Date.now() - ts > 4 * 3_600_000) alertedPools.delete(addr);
+const SEP = '——————————————————';
 
-  for (const p of pools) {
-    const a = p.attributes;
-    if (alertedPools.has(a.address)) continue;
+const poolLink = addr => `https://www.geckoterminal.com/besc-hyperchain/pools/${addr}`;
+
+function formatPoolAlert(p) {
+  if (p.source === 'chain') {
+    const price = fmtPrice(getPairView(p).price);
+    return (
+      `🆕 <b>NEW POOL CREATED</b>\n` +
+      `——————————————————\n` +
+      `<b>${p.name}</b>  ·  ${ageStr(p.createdAt)} old\n` +
+      (price ? `💰 <b>${price}</b>  ·  ` : '💧 ') + `Liq: ${fmtUsd(p.liq)}\n` +
+      `⛓️ Spotted on-chain — not indexed by GeckoTerminal yet\n` +
+      `<a href="${poolLink(p.address)}">📈 Open Chart</a>`
+    );
+  }
 
-    const ageMins = (Date.now() - new Date(a.pool_created_at).getTime()) / 60000;
-    if (ageMins > 30) continue;
-    if (Number(a.reserve_in_usd || 0) < 200) continue;
+  const pv    = getPairView(p);
+  const price = fmtPrice(pv.price);
+  const total = pv.buysH1 + pv.sellsH1;
+  const buyPct = total > 0 ? Math.round(pv.buysH1 / total * 100) : null;
 
-    alertedPools.set(a.address, Date.now());
+  return (
+    `🆕 <b>NEW POOL LAUNCHED</b>\n` +
+    `——————————————————\n` +
+    `<b>${pv.name}</b>  ·  ${ageStr(p.createdAt)} old\n` +
+    (price ? `💰 <b>${price}</b>${pv.mc ? `  ·  MC: ${fmtUsd(pv.mc)}` : ''}\n` : '') +
+    `📊 1h: <b>${fmtPct(pv.chgH1)}</b>  ·  24h: <b>${fmtPct(pv.chgH24)}</b>\n` +
+    `💧 Vol: ${fmtUsd(pv.volH1)}  ·  Liq: ${fmtUsd(p.liq)}\n` +
+    (buyPct !== null ? `🔄 ${pv.buysH1}B / ${pv.sellsH1}S  (${buyPct}% buy)\n` : '') +
+    `<a href="${poolLink(p.address)}">📈 Open Chart</a>`
+  );
+}
 
+function formatAlertDigest(pools) {
+  const shown = pools.slice(0, Number(ALERT_DIGEST_MAX));
+  const lines = [`🆕 <b>${pools.length} NEW POOLS LAUNCHED</b>`, SEP];
+  for (const p of shown) {
     const pv    = getPairView(p);
     const price = fmtPrice(pv.price);
-    const total = pv.buysH1 + pv.sellsH1;
-    const buyPct = total > 0 ? Math.round(pv.buysH1 / total * 100) : null;
-    const liq   = Number(a.reserve_in_usd || 0);
+    lines.push(
+      `• <b>${pv.name}</b>  ·  ${ageStr(p.createdAt)}` +
+      (price ? `  ·  ${price}` : '') +
+      `  ·  Liq ${fmtUsd(p.liq)}  <a href="${poolLink(p.address)}">Chart ↗</a>`
+    );
+  }
+  if (pools.length > shown.length) lines.push(`<i>+${pools.length - shown.length} more</i>`);
+  return lines.join('\n');
+}
 
-    await bot.sendMessage(TELEGRAM_CHAT_ID,
-      `🆕 <b>NEW POOL LAUNCHED</b>\n` +
-      `——————————————————\n` +
-      `<b>${pv.name}</b>  ·  ${ageStr(a.pool_created_at)} old\n` +
-      (price ? `💰 <b>${price}</b>${pv.mc ? `  ·  MC: ${fmtUsd(pv.mc)}` : ''}\n` : '') +
-      `📊 1h: <b>${fmtPct(pv.chgH1)}</b>  ·  24h: <b>${fmtPct(pv.chgH24)}</b>\n` +
-      `💧 Vol: ${fmtUsd(pv.volH1)}  ·  Liq: ${fmtUsd(liq)}\n` +
-      (buyPct !== null ? `🔄 ${pv.buysH1}B / ${pv.sellsH1}S  (${buyPct}% buy)\n` : '') +
-      `<a href="https://www.geckoterminal.com/besc-hyperchain/pools/${a.address}">📈 Open Chart</a>`,
-      { parse_mode: 'HTML', disable_web_page_preview: true }
-    ).catch(e => console.error('[TrendingBot] Alert failed:', e.message));
+function queueAlert(chat, text) {
+  sendQueue.push('alert', chat.id, async () => {
+    const done = stageSeconds.start({ stage: 'alerts' });
+    try {
+      return await tgCall(chat.id, 'sendMessage', () => bot.sendMessage(chat.id, text, { parse_mode: 'HTML', disable_web_page_preview: true }));
+    } finally {
+      done();
+    }
+  }).catch(e => console.error(`[TrendingBot] Alert to ${chat.id} failed:`, e.message));
+}
+
+// Alerts are queued behind the board and never awaited by the cycle
+function sendNewPoolAlerts(pools) {
+  alertedPools.prune();
+
+  const fresh = [];
+  for (const p of pools) {
+    if (alertedPools.has(p.address)) continue;
+
+    const ageMins = (Date.now() - p.createdAt) / 60000;
+    if (ageMins > Number(ALERT_MAX_AGE_MINUTES)) continue;
+    if (p.liq < 200) continue;
+
+    markAlerted(p);
+    fresh.push(p);
   }
+  dispatchAlerts(fresh);
 }
 
-// ─── Message builder ───────────────────────────────────────────────────────────
+function markAlerted(p) {
+  const now = Date.now();
+  alertedPools.set(p.address, now);
+  persist({ k: 'alert', a: p.address, t: now });
+}
 
-const SEP = '——————————————————';
+function dispatchAlerts(fresh) {
+  for (const chat of chats) {
+    const launches = fresh.filter(p => !chat.blocked.has(p.symbol));
+    if (launches.length > Number(ALERT_DIGEST_THRESHOLD)) {
+      queueAlert(chat, formatAlertDigest(launches));
+      continue;
+    }
+    for (const p of launches) queueAlert(chat, formatPoolAlert(p));
+  }
+}
+
+// ─── Fast-lane alerts ──────────────────────────────────────────────────────────
+// Polls page 1 of new_pools every ALERT_POLL_SECONDS, independent of the board
+// cadence, and pushes it through the same alert path and dedupe as the board
+// cycle. Requests draw from the "alerts" budget in GECKO_BUDGETS, so the board's
+// discovery crawl keeps its own share of the rate limit. It pauses while the
+// board breaker is open but never trips it: a flaky new_pools endpoint must not
+// stale boards that discovery keeps healthy.
+
+async function pollNewPools() {
+  if (sourceBreaker.state !== 'closed') return; // the board cycle owns recovery probes
+  const data  = await geckoGet('/new_pools', { page: 1 }, { budget: 'alerts', fresh: true });
+  const pools = (data.data || []).map(normalizePool).filter(isGoodPool);
+  sendNewPoolAlerts(pools);
+}
+
+// ─── On-chain watcher ──────────────────────────────────────────────────────────
+// Optional (CHAIN_WS_URL): subscribes to factory PairCreated / PoolCreated logs
+// over a JSON-RPC websocket and alerts new pools seconds after creation instead
+// of whenever GeckoTerminal lists them. Needs DEX_FACTORIES — any contract can
+// emit these events, so the subscription is limited to known factories — and
+// CHAIN_RPC_URL, because a new pool is only alerted once it holds real WBESC
+// liquidity (V2 reserves, or the pool's WBESC balance for V3). A local node
+// (e.g. anvil) works as a stand-in for testing.
+
+const TOPIC_PAIR_CREATED = '0x0d3648bd0f6ba80134a33ba9275ac585d9d315f0ad8355cddefde31afa28d0e9'; // UniswapV2
+const TOPIC_POOL_CREATED = '0x783cca1c0412dd0d695e784568c96da2e9c22ff989357a2e8b1d9b2b4e6b7118'; // UniswapV3
+const SEL_SYMBOL         = '0x95d89b41';
+
+// Minimal JSON-RPC client over a reconnecting websocket. Subscriptions don't
+// survive a reconnect, so every onOpen handler runs again on each new socket.
+class RpcSocket {
+  constructor(url) {
+    this.url      = url;
+    this.nextId   = 1;
+    this.pending  = new Map(); // request id -> { resolve, reject, timer }
+    this.subs     = new Map(); // subscription id -> handler
+    this.openers  = [];
+    this.closers  = [];
+    this.attempts = 0;
+  }
+
+  get isOpen() {
+    return this.ws?.readyState === 1;
+  }
+
+  onOpen(fn) {
+    this.openers.push(fn);
+    if (this.isOpen) this.runOpener(fn);
+  }
+
+  onClose(fn) {
+    this.closers.push(fn);
+  }
+
+  runOpener(fn) {
+    fn(this).catch(e => console.error('[TrendingBot] RPC subscribe failed:', e.message));
+  }
+
+  async connect() {
+    // Node 22+ ships WebSocket; older runtimes use the optional `ws` package
+    const WS = globalThis.WebSocket ?? (await import('ws')).default;
+    const ws = this.ws = new WS(this.url);
+
+    ws.onopen = () => {
+      this.attempts = 0;
+      this.subs.clear();
+      console.log(`[TrendingBot] RPC socket connected: ${this.url}`);
+      for (const fn of this.openers) this.runOpener(fn);
+    };
+    ws.onmessage = ev => {
+      try { this.receive(JSON.parse(String(ev.data))); } catch { /* not JSON-RPC */ }
+    };
+    ws.onerror = () => {}; // always followed by close
+    ws.onclose = () => {
+      for (const [id, p] of this.pending) {
+        clearTimeout(p.timer);
+        p.reject(new Error('RPC socket closed'));
+        this.pending.delete(id);
+      }
+      for (const fn of this.closers) fn(this);
+      const wait = backoffMs(this.attempts++);
+      console.warn(`[TrendingBot] RPC socket closed, reconnecting in ${Math.round(wait)}ms`);
+      setTimeout(() => this.connect().catch(e => console.error('[TrendingBot] RPC connect failed:', e.message)), wait);
+    };
+  }
+
+  receive(msg) {
+    if (msg.method === 'eth_subscription') {
+      this.subs.get(msg.params.subscription)?.(msg.params.result);
+      return;
+    }
+    const p = this.pending.get(msg.id);
+    if (!p) return;
+    this.pending.delete(msg.id);
+    clearTimeout(p.timer);
+    if (msg.error) p.reject(new Error(msg.error.message));
+    else           p.resolve(msg.result);
+  }
+
+  request(method, params = []) {
+    return new Promise((resolve, reject) => {
+      if (!this.isOpen) return reject(new Error('RPC socket not open'));
+      const id    = this.nextId++;
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error(`RPC ${method} timed out`));
+      }, 15000);
+      this.pending.set(id, { resolve, reject, timer });
+      this.ws.send(JSON.stringify({ jsonrpc: '2.0', id, method, params }));
+    });
+  }
+
+  async subscribe(params, handler) {
+    const id = await this.request('eth_subscribe', params);
+    this.subs.set(id, handler);
+    return id;
+  }
+
+  async unsubscribe(id) {
+    this.subs.delete(id);
+    await this.request('eth_unsubscribe', [id]).catch(() => {});
+  }
+}
+
+const topicAddress = topic => `0x${topic.slice(26)}`.toLowerCase();
+
+// ABI string return value; a few old tokens return bytes32 instead
+function decodeAbiString(hex) {
+  const h = (hex || '0x').slice(2);
+  if (h.length === 64) return Buffer.from(h, 'hex').toString('utf8').replace(/\0+$/, '');
+  if (h.length < 128)  return '';
+  const len = parseInt(h.slice(64, 128), 16);
+  return Buffer.from(h.slice(128, 128 + len * 2), 'hex').toString('utf8');
+}
+
+const tokenSymbols = new BoundedCache(stateCacheOpts); // token address -> symbol (HTML-escaped)
+
+async function tokenSymbol(rpc, token) {
+  if (tokenSymbols.has(token)) return tokenSymbols.get(token);
+  const hex = await rpc.request('eth_call', [{ to: token, data: SEL_SYMBOL }, 'latest']).catch(() => '0x');
+  const sym = escapeHtml(decodeAbiString(hex).trim().slice(0, 32)) || token.slice(0, 8);
+  tokenSymbols.set(token, sym);
+  return sym;
+}
+
+// Liquidity is usually added a block or more after creation, so reserves are
+// read a few times before the pool is left to the GeckoTerminal alert path
+const CHAIN_ALERT_CHECKS = [15_000, 60_000, 180_000]; // ms after the event
+
+async function onPoolCreated(rpc, log) {
+  if (log.removed) return; // reorged out
+
+  const data = log.data.slice(2);
+  const v3   = log.topics[0] === TOPIC_POOL_CREATED;
+  const pool = v3
+    ? `0x${data.slice(88, 128)}`    // (int24 tickSpacing, address pool)
+    : `0x${data.slice(24, 64)}`;    // (address pair, uint)
+  if (alertedPools.has(pool)) return;
+
+  const [token0, token1] = [topicAddress(log.topics[1]), topicAddress(log.topics[2])];
+  const [sym0, sym1]     = await Promise.all([tokenSymbol(rpc, token0), tokenSymbol(rpc, token1)]);
+  const [base, quote, baseToken, quoteToken] = sym0 === CHAIN_NATIVE
+    ? [sym1, sym0, token1, token0]
+    : [sym0, sym1, token0, token1];
+
+  const p = {
+    ...normalizePool({
+      attributes: { address: pool, name: `${base} / ${quote}`, pool_created_at: new Date().toISOString() },
+    }),
+    baseToken,
+    quoteToken,
+    source: 'chain',
+  };
+  if (STABLE_RE.test(p.symbol)) return;
+  console.log(`[TrendingBot] On-chain pool created: ${p.name} (${pool})`);
+
+  // Same gates as the GeckoTerminal path, bar trade activity (not known yet)
+  for (const delay of CHAIN_ALERT_CHECKS) {
+    await sleep(delay);
+    if (v3) p.liq = await v3Liquidity(p).catch(() => 0);
+    else    await applyChainQuotes([p]).catch(() => 0);
+    if (alertedPools.has(p.address)) return; // GeckoTerminal listed it first
+    const reason = rejectReason(p);
+    if (p.liq >= 200 && (!reason || reason === 'inactive')) {
+      markAlerted(p);
+      dispatchAlerts([p]);
+      return;
+    }
+  }
+}
+
+function watchPoolCreation(rpc) {
+  const factories = DEX_FACTORIES.split(',').map(a => a.trim().toLowerCase()).filter(Boolean);
+  if (!factories.length || !CHAIN_RPC_URL) {
+    console.warn('[TrendingBot] Pool-creation watcher off: needs DEX_FACTORIES and CHAIN_RPC_URL');
+    return;
+  }
+  const filter = { address: factories, topics: [[TOPIC_PAIR_CREATED, TOPIC_POOL_CREATED]] };
+
+  rpc.onOpen(async rpc => {
+    await rpc.subscribe(['logs', filter], log =>
+      onPoolCreated(rpc, log).catch(e => console.error('[TrendingBot] Pool-created handler failed:', e.message))
+    );
+    console.log(`[TrendingBot] Watching ${factories.length} factories for new pools`);
+  });
+}
+
+// ─── On-chain quotes ───────────────────────────────────────────────────────────
+// Optional (CHAIN_RPC_URL): re-prices the pools about to be shown from live pair
+// reserves, so top-of-board prices are seconds old instead of indexer old. All
+// reads for a cycle go out as JSON-RPC batches of eth_call, one round trip per
+// 100 calls. WBESC is priced in USD through the deepest WBESC/stable pair and
+// every WBESC-paired V2 pool through WBESC; anything else (V3 pools without
+// getReserves, pairs not touching WBESC) keeps GeckoTerminal's numbers.
+
+const SEL_GET_RESERVES = '0x0902f1ac';
+const SEL_TOKEN0       = '0x0dfe1681';
+const SEL_DECIMALS     = '0x313ce567';
+const SEL_BALANCE_OF   = '0x70a08231';
+
+const rpcHttp       = axios.create({ timeout: 5000 });
+const poolToken0    = new BoundedCache(stateCacheOpts); // pool address -> token0 address
+const tokenDecimals = new BoundedCache(stateCacheOpts); // token address -> decimals
+
+const abiWord = (hex, i) => BigInt(`0x${hex.slice(2 + i * 64, 2 + (i + 1) * 64)}`);
+
+// eth_call results in call order; reverted or failed calls come back as null
+async function rpcBatch(calls) {
+  const out = new Array(calls.length).fill(null);
+  for (let i = 0; i < calls.length; i += 100) {
+    const batch = calls.slice(i, i + 100).map((call, j) => ({
+      jsonrpc: '2.0', id: i + j, method: 'eth_call', params: [call, 'latest'],
+    }));
+    const { data } = await rpcHttp.post(CHAIN_RPC_URL, batch);
+    for (const r of [].concat(data)) {
+      if (r && !r.error && r.result && r.result !== '0x') out[r.id] = r.result;
+    }
+  }
+  return out;
+}
+
+// token0 per pool and decimals per token never change, so each is read once
+async function loadChainMeta(pools) {
+  const pools0 = pools.filter(p => !poolToken0.has(p.address));
+  const tokens = [...new Set(pools.flatMap(p => [p.baseToken, p.quoteToken]))]
+    .filter(t => !tokenDecimals.has(t));
+  if (!pools0.length && !tokens.length) return;
+
+  const res = await rpcBatch([
+    ...pools0.map(p => ({ to: p.address, data: SEL_TOKEN0 })),
+    ...tokens.map(t => ({ to: t, data: SEL_DECIMALS })),
+  ]);
+  pools0.forEach((p, i) => { if (res[i]) poolToken0.set(p.address, `0x${res[i].slice(26, 66)}`); });
+  tokens.forEach((t, i) => {
+    const r = res[pools0.length + i];
+    if (r) tokenDecimals.set(t, Number(abiWord(r, 0)));
+  });
+}
+
+// Returns base/quote reserves in whole-token units, keyed by pool address
+async function readReserves(pools) {
+  await loadChainMeta(pools);
+  const res      = await rpcBatch(pools.map(p => ({ to: p.address, data: SEL_GET_RESERVES })));
+  const reserves = new Map();
+
+  pools.forEach((p, i) => {
+    const t0 = poolToken0.get(p.address);
+    const db = tokenDecimals.get(p.baseToken);
+    const dq = tokenDecimals.get(p.quoteToken);
+    if (!res[i] || res[i].length < 130 || !t0 || db === undefined || dq === undefined) return;
+
+    const [r0, r1] = [abiWord(res[i], 0), abiWord(res[i], 1)];
+    const [rb, rq] = t0 === p.baseToken ? [r0, r1] : [r1, r0];
+    const base  = Number(rb) / 10 ** db;
+    const quote = Number(rq) / 10 ** dq;
+    if (base > 0 && quote > 0) reserves.set(p.address, { base, quote });
+  });
+  return reserves;
+}
+
+// WBESC in USD from the deepest reference pool whose reserves were read
+function wbescUsdFrom(reserves) {
+  for (const p of usdRefPools) {
+    const r = reserves.get(p.address);
+    if (r) return p.base === CHAIN_NATIVE ? r.quote / r.base : r.base / r.quote;
+  }
+  return null;
+}
+
+// Overwrites price, liquidity and market cap on the given snapshots in place
+async function applyChainQuotes(pools) {
+  const byAddr  = new Map([...pools, ...usdRefPools].map(p => [p.address, p]));
+  const tracked = [...byAddr.values()].filter(p => p.baseToken && p.quoteToken);
+  if (!tracked.length) return 0;
+
+  const reserves = await readReserves(tracked);
+  const wbescUsd = wbescUsdFrom(reserves);
+  if (!wbescUsd) return 0;
+
+  let quoted = 0;
+  for (const p of pools) {
+    const r = reserves.get(p.address);
+    if (!r) continue;
+
+    let priceBase, priceQuote, wbescSide;
+    if (p.quote === CHAIN_NATIVE) {
+      priceQuote = wbescUsd;
+      priceBase  = r.quote / r.base * wbescUsd;
+      wbescSide  = r.quote;
+    } else if (p.base === CHAIN_NATIVE) {
+      priceBase  = wbescUsd;
+      priceQuote = r.base / r.quote * wbescUsd;
+      wbescSide  = r.base;
+    } else {
+      continue;
+    }
+
+    if (p.mc > 0 && p.priceBase > 0) p.mc *= priceBase / p.priceBase; // same supply, new price
+    p.priceBase  = priceBase;
+    p.priceQuote = priceQuote;
+    p.liq        = 2 * wbescSide * wbescUsd;
+    quoted++;
+  }
+  return quoted;
+}
+
+// V3 pools have no getReserves, and their price isn't a balance ratio; for the
+// new-pool liquidity gate the WBESC the pool holds is enough (2x, as for V2)
+async function v3Liquidity(p) {
+  const wbesc = p.quote === CHAIN_NATIVE ? p.quoteToken : p.base === CHAIN_NATIVE ? p.baseToken : null;
+  if (!wbesc) return 0;
+  await loadChainMeta([p]);
+  const [bal]    = await rpcBatch([{ to: wbesc, data: SEL_BALANCE_OF + p.address.slice(2).padStart(64, '0') }]);
+  const decimals = tokenDecimals.get(wbesc);
+  const wbescUsd = wbescUsdFrom(await readReserves(usdRefPools));
+  if (!bal || decimals === undefined || !wbescUsd) return 0;
+  return 2 * Number(abiWord(bal, 0)) / 10 ** decimals * wbescUsd;
+}
+
+// ─── Swap indexer ──────────────────────────────────────────────────────────────
+// Optional (SWAP_INDEXER_POOLS > 0, needs CHAIN_WS_URL and CHAIN_RPC_URL): the
+// top-ranked pools' V2 Swap logs are streamed into per-pool rings of 1440
+// one-minute buckets, giving exact m5/h1/h24 volume and buy/sell counts. A
+// window only replaces GeckoTerminal's aggregate while a Swap subscription is
+// live and has been for the window's full length. A pool that drops out of the
+// top SWAP_INDEXER_POOLS stays subscribed for WATCH_TTL_MINUTES, so ordinary
+// rank churn at the cutoff doesn't restart its coverage.
+
+const TOPIC_SWAP  = '0xd78ad95fa46c994b6551d0da85fc275fe613ce37657fb8d5e3d130840159d822'; // UniswapV2Pair
+const RING_MINUTES = 1440;
+
+class SwapWindow {
+  constructor() {
+    this.since  = Infinity; // set once a live subscription includes the pool
+    this.minute = new Int32Array(RING_MINUTES).fill(-1); // epoch minute held by each slot
+    this.vol    = new Float64Array(RING_MINUTES);
+    this.buys   = new Uint32Array(RING_MINUTES);
+    this.sells  = new Uint32Array(RING_MINUTES);
+  }
+
+  add(ts, usd, isBuy) {
+    const m = Math.floor(ts / 60_000);
+    const i = m % RING_MINUTES;
+    if (this.minute[i] !== m) {
+      this.minute[i] = m;
+      this.vol[i] = this.buys[i] = this.sells[i] = 0;
+    }
+    this.vol[i] += usd;
+    if (isBuy) this.buys[i]++;
+    else       this.sells[i]++;
+  }
+
+  sum(minutes, now) {
+    const last = Math.floor(now / 60_000);
+    let vol = 0, buys = 0, sells = 0;
+    for (let m = last - minutes + 1; m <= last; m++) {
+      const i = m % RING_MINUTES;
+      if (this.minute[i] !== m) continue;
+      vol   += this.vol[i];
+      buys  += this.buys[i];
+      sells += this.sells[i];
+    }
+    return { vol, buys, sells };
+  }
+}
+
+// pool address -> SwapWindow; w.pool is the latest snapshot (for price and tokens)
+const swapWindows = new BoundedCache({
+  max:   Number(SWAP_INDEXER_POOLS) * 4,
+  ttlMs: Number(WATCH_TTL_MINUTES) * 60_000,
+});
+let swapSubId       = null;
+let swapSubscribing = null;      // tail of the serialized (re)subscribe chain
+let indexerSince    = 0;         // when the live subscription began — restarts after a drop
+const swapSeen      = new BoundedCache({ max: 50_000, ttlMs: 10 * 60_000 }); // transactionHash:logIndex
+
+function onSwap(log) {
+  if (log.removed) return;
+  // Old and new subscriptions overlap briefly on a resubscribe
+  const id = `${log.transactionHash}:${log.logIndex}`;
+  if (swapSeen.has(id)) return;
+  swapSeen.prune();
+  swapSeen.set(id, true);
+
+  const addr = log.address.toLowerCase();
+  const w    = swapWindows.peek(addr);
+  const p    = w?.pool;
+  const t0   = poolToken0.get(addr);
+  const db   = tokenDecimals.get(p?.baseToken);
+  if (!p || !t0 || db === undefined) return;
+
+  // Swap(sender, amount0In, amount1In, amount0Out, amount1Out, to)
+  const baseIs0 = t0 === p.baseToken;
+  const baseIn  = abiWord(log.data, baseIs0 ? 0 : 1);
+  const baseOut = abiWord(log.data, baseIs0 ? 2 : 3);
+  const amount  = Number(baseIn + baseOut) / 10 ** db;
+  w.add(Date.now(), amount * p.priceBase, baseOut > baseIn);
+}
+
+// The new subscription is opened before the old one is dropped, so no swap
+// falls into the gap; logs delivered by both are deduped in onSwap
+async function resubscribeSwaps() {
+  if (!chainRpc?.isOpen) return;
+  const old       = swapSubId;
+  const addresses = [...swapWindows].map(([addr]) => addr);
+  if (!addresses.length) {
+    if (old) chainRpc.unsubscribe(old);
+    swapSubId = null;
+    return;
+  }
+  const id = await chainRpc.subscribe(['logs', { address: addresses, topics: [TOPIC_SWAP] }], onSwap);
+  if (old) chainRpc.unsubscribe(old);
+  swapSubId = id;
+
+  // A subscription from scratch restarts coverage; pools new to it start theirs
+  const now = Date.now();
+  if (!old) indexerSince = now;
+  for (const addr of addresses) {
+    const w = swapWindows.peek(addr);
+    if (w && w.since === Infinity) w.since = now;
+  }
+}
+
+// Serialized so the socket opener and trackSwaps never start overlapping
+// resubscribes, which could leave a stale subscription live
+function subscribeSwaps() {
+  const run = (swapSubscribing ?? Promise.resolve()).catch(() => {}).then(resubscribeSwaps);
+  swapSubscribing = run;
+  run.catch(() => {}).finally(() => {
+    if (swapSubscribing === run) swapSubscribing = null;
+  });
+  return run;
+}
+
+// Called once per cycle with the pools worth indexing; resubscribes only when
+// the set of live windows changes
+async function trackSwaps(pools) {
+  pools = pools.filter(p => p.baseToken && p.quoteToken);
+  await loadChainMeta(pools);
+
+  const before = new Set([...swapWindows].map(([addr]) => addr));
+  swapWindows.prune();
+  for (const p of pools) {
+    const w = swapWindows.peek(p.address) ?? new SwapWindow();
+    w.pool = p;
+    swapWindows.set(p.address, w);
+  }
+  const live = [...swapWindows].map(([addr]) => addr);
+  const same = live.length === before.size && live.every(a => before.has(a));
+
+  if (!same || (!swapSubId && !swapSubscribing)) await subscribeSwaps();
+}
+
+// Overwrites GeckoTerminal aggregates with indexed ones wherever a window is fully covered
+function applySwapAggregates(pools, now = Date.now()) {
+  if (!swapSubId) return; // no live subscription — the rings are missing swaps
+  for (const p of pools) {
+    const w = swapWindows.peek(p.address);
+    if (!w) continue;
+    const covered = (now - Math.max(w.since, indexerSince)) / 60_000;
+
+    if (covered >= 5) {
+      const m5 = w.sum(5, now);
+      p.volM5  = m5.vol;
+      p.buysM5 = m5.buys;
+    }
+    if (covered >= 60) {
+      const h1  = w.sum(60, now);
+      p.volH1   = h1.vol;
+      p.buysH1  = h1.buys;
+      p.sellsH1 = h1.sells;
+    }
+    if (covered >= RING_MINUTES) {
+      const h24  = w.sum(RING_MINUTES, now);
+      p.volH24   = h24.vol;
+      p.buysH24  = h24.buys;
+      p.sellsH24 = h24.sells;
+    }
+  }
+}
+
+// ─── Message builder ───────────────────────────────────────────────────────────
 
-function buildPoolEntry(p, rank) {
-  const a  = p.attributes;
+function buildPoolEntry(p, rank, prevRanks) {
   const pv = getPairView(p);
 
   const price  = fmtPrice(pv.price);
@@ -288,8 +1856,8 @@ function buildPoolEntry(p, rank) {
   const buyPct = total > 0 ? Math.round(pv.buysH1 / total * 100) : null;
 
   // X since launch (all non-bridge pools)
-  const launchP = launchPriceCache.get(a.address);
-  const currP   = Number(pv.price);
+  const launchP = launchPriceCache.get(p.address);
+  const currP   = pv.price;
   let xTag = '';
   if (launchP > 0 && currP > 0) {
     const mult = currP / launchP;
@@ -305,7 +1873,7 @@ function buildPoolEntry(p, rank) {
   const accelTag = accel && accel > 2 ? ` ⚡${accel.toFixed(1)}x vol` : '';
 
   // Rank change since last poll
-  const prevRank = prevRankMap[a.address];
+  const prevRank = prevRanks[p.address];
   let rankTag = '';
   if (prevRank !== undefined && prevRank !== rank) {
     const d = prevRank - rank;
@@ -313,8 +1881,8 @@ function buildPoolEntry(p, rank) {
   }
 
   // Age tag for pools < 12h old
-  const ageH   = (Date.now() - new Date(a.pool_created_at).getTime()) / 3_600_000;
-  const ageTag = ageH < 12 ? ` 🆕 ${ageStr(a.pool_created_at)}` : '';
+  const ageH   = (Date.now() - p.createdAt) / 3_600_000;
+  const ageTag = ageH < 12 ? ` 🆕 ${ageStr(p.createdAt)}` : '';
 
   const bpEmoji = buyPct !== null
     ? (buyPct >= 70 ? ' 🟢' : buyPct >= 55 ? ' 📈' : buyPct <= 30 ? ' 🔴' : '')
@@ -324,13 +1892,13 @@ function buildPoolEntry(p, rank) {
     ? `🔄 ${pv.buysH1}B / ${pv.sellsH1}S  (${buyPct}% buy)${bpEmoji}`
     : `🔄 No trades in last hour`;
 
-  const link = `https://www.geckoterminal.com/besc-hyperchain/pools/${a.address}`;
+  const link = poolLink(p.address);
 
   return (
     `${rankBadge(rank)} <b>${pv.name}</b>${rankTag}${xTag}${accelTag}${ageTag}\n` +
     (price ? `💰 <b>${price}</b>${pv.mc ? `  ·  MC: ${fmtUsd(pv.mc)}` : ''}\n` : '') +
     `${moodEmoji(pv.chgM5, pv.chgH1)} 5m: <b>${fmtPct(pv.chgM5)}</b>  1h: <b>${fmtPct(pv.chgH1)}</b>  24h: <b>${fmtPct(pv.chgH24)}</b>\n` +
-    `💧 Vol: ${fmtUsd(pv.volH1)}  ·  Liq: ${fmtUsd(a.reserve_in_usd)}\n` +
+    `💧 Vol: ${fmtUsd(pv.volH1)}  ·  Liq: ${fmtUsd(p.liq)}\n` +
     `${txLine}  <a href="${link}">Chart ↗</a>`
   );
 }
@@ -338,14 +1906,16 @@ function buildPoolEntry(p, rank) {
 // ─── Trending message ──────────────────────────────────────────────────────────
 // Native tokens get the full trending layout.
 // Bridge pairs (WBESC/WBNB etc.) go into a compact price-reference section below.
+// staleSince (ms) marks a board re-rendered from the last good snapshot.
 
-function formatTrending(nativePools, bridgePools, movers) {
+function formatTrending(nativePools, bridgePools, movers, prevRanks, staleSince = null) {
   const time = fmtTime();
 
   const lines = [
     `🔥 <b>BESC HyperChain — Trending</b>`,
     `🕒 ${time} UTC${movers.length ? `  ·  ⬆️ ${movers.map(m => `${m.name} ↑${m.delta}`).join('  ')}` : ''}`,
   ];
+  if (staleSince) lines.push(`⚠️ <i>Data source unavailable — showing data from ${ageStr(staleSince)} ago</i>`);
 
   if (!nativePools.length && !bridgePools.length) {
     lines.push(`\n${SEP}\n😴 <b>No active pools right now</b>\nChain is quiet — check back soon!\n${SEP}`);
@@ -356,7 +1926,7 @@ function formatTrending(nativePools, bridgePools, movers) {
   // ── Native token trending ──────────────────────────────────────────────────
   if (nativePools.length) {
     for (let i = 0; i < nativePools.length; i++) {
-      lines.push(`\n${SEP}\n${buildPoolEntry(nativePools[i], i)}`);
+      lines.push(`\n${SEP}\n${buildPoolEntry(nativePools[i], i, prevRanks)}`);
     }
   } else {
     lines.push(`\n${SEP}\n<i>No native token activity right now</i>`);
@@ -382,63 +1952,393 @@ function formatTrending(nativePools, bridgePools, movers) {
   return lines.join('\n');
 }
 
+// ─── Telegram send queue ───────────────────────────────────────────────────────
+// Every Telegram call goes through tgCall(), which waits on the bot-wide bucket
+// (TG_GLOBAL_PER_SEC) and the chat's own bucket (TG_CHAT_PER_SEC). A 429 pauses
+// that chat for retry_after and the call is retried until it lands; network
+// errors are retried TG_MAX_RETRIES times.
+//
+// Whole jobs (a board publish, one alert) go through sendQueue: the board lane
+// always drains before the alert lane, and jobs for one chat run in order and
+// never concurrently.
+
+const tgBucket    = new TokenBucket(Number(TG_GLOBAL_PER_SEC), Number(TG_GLOBAL_PER_SEC));
+const chatBuckets = new Map();
+
+function chatBucket(chatId) {
+  let b = chatBuckets.get(chatId);
+  if (!b) chatBuckets.set(chatId, b = new TokenBucket(Number(TG_CHAT_PER_SEC), 1));
+  return b;
+}
+
+async function tgCall(chatId, method, fn) {
+  const bucket = chatBucket(chatId);
+  for (let attempt = 0; ; attempt++) {
+    await tgBucket.take();
+    await bucket.take();
+    const done = tgSeconds.start({ method });
+    try {
+      const result = await fn();
+      done();
+      return result;
+    } catch (e) {
+      done();
+      tgErrors.inc({ method, code: e.response?.body?.error_code ?? e.code ?? 'unknown' });
+      const retryAfter = e.response?.body?.parameters?.retry_after;
+      if (retryAfter) {
+        bucket.pause(retryAfter * 1000);
+        console.warn(`[TrendingBot] Telegram 429 in ${chatId}, retrying in ${retryAfter}s`);
+        continue;
+      }
+      if (e.code === 'EFATAL' && attempt < Number(TG_MAX_RETRIES)) {
+        await sleep(backoffMs(attempt));
+        continue;
+      }
+      throw e;
+    }
+  }
+}
+
+class SendQueue {
+  constructor(concurrency) {
+    this.concurrency = Math.max(1, concurrency);
+    this.lanes       = { board: [], alert: [] };
+    this.busyChats   = new Set();
+  }
+
+  get pending() {
+    return this.lanes.board.length + this.lanes.alert.length;
+  }
+
+  push(lane, chatId, run) {
+    return new Promise((resolve, reject) => {
+      this.lanes[lane].push({ chatId, run, resolve, reject });
+      this.pump();
+    });
+  }
+
+  next() {
+    for (const lane of [this.lanes.board, this.lanes.alert]) {
+      const i = lane.findIndex(j => !this.busyChats.has(j.chatId));
+      if (i !== -1) return lane.splice(i, 1)[0];
+    }
+    return null;
+  }
+
+  pump() {
+    while (this.busyChats.size < this.concurrency) {
+      const job = this.next();
+      if (!job) return;
+      this.busyChats.add(job.chatId);
+      job.run().then(job.resolve, job.reject).finally(() => {
+        this.busyChats.delete(job.chatId);
+        this.pump();
+      });
+    }
+  }
+}
+
+const sendQueue = new SendQueue(Number(SEND_CONCURRENCY));
+
+// ─── Publishing ────────────────────────────────────────────────────────────────
+// PIN_MODE=edit rewrites the pinned board in place (one call per cycle); the
+// unpin/delete/send/pin sequence only runs when there is no board yet, the edit
+// fails (message deleted, too old, lost rights) or PIN_MODE=repost.
+
+const BOARD_OPTS = { parse_mode: 'HTML', disable_web_page_preview: true };
+
+async function publishBoard(chat, text) {
+  const call = (method, fn) => tgCall(chat.id, method, fn);
+
+  if (PIN_MODE === 'edit' && chat.pinnedId) {
+    try {
+      await call('editMessageText', () => bot.editMessageText(text, { chat_id: chat.id, message_id: chat.pinnedId, ...BOARD_OPTS }));
+      return chat.pinnedId;
+    } catch (e) {
+      // Telegram rejects an identical edit — the pinned board is already current
+      if (/message is not modified/i.test(e.message)) return chat.pinnedId;
+      console.warn(`[TrendingBot] Edit in ${chat.id} failed, reposting: ${e.message}`);
+    }
+  }
+
+  if (chat.pinnedId) {
+    await call('unpinAllChatMessages', () => bot.unpinAllChatMessages(chat.id)).catch(() => {});
+    await call('deleteMessage', () => bot.deleteMessage(chat.id, chat.pinnedId)).catch(() => {});
+  }
+
+  const msg = await call('sendMessage', () => bot.sendMessage(chat.id, text, BOARD_OPTS));
+  await call('pinChatMessage', () => bot.pinChatMessage(chat.id, msg.message_id, { disable_notification: true }));
+  return msg.message_id;
+}
+
+// ─── Change detection ──────────────────────────────────────────────────────────
+// A board is only re-published when it differs materially from the last one
+// sent. Identical text (ignoring the clock line) is always skipped; otherwise the
+// pool order, rank deltas, movers and launch tags must match and every numeric
+// field must sit within BOARD_CHANGE_THRESHOLDS of what was published:
+// price/vol/liq in relative %, chg in percentage points, tx in trade count.
+// BOARD_MAX_SKIP_MINUTES bounds how stale the clock line can get.
+
+const CHANGE_THRESHOLDS = {
+  price: 0, vol: 0, liq: 0, chg: 0, tx: 0,
+  ...Object.fromEntries(
+    BOARD_CHANGE_THRESHOLDS.split(',')
+      .map(s => s.split(':').map(t => t.trim()))
+      .filter(([field, v]) => field && Number.isFinite(Number(v)))
+      .map(([field, v]) => [field, Number(v)])
+  ),
+};
+
+function boardHash(text) {
+  return crypto.createHash('sha1').update(text.replace(/🕒 \d\d:\d\d UTC/, '🕒')).digest('hex');
+}
+
+function boardState(nativePools, bridgePools, movers, prevRanks) {
+  const rows = [...nativePools, ...bridgePools.slice(0, 5)].map(p => {
+    const pv = getPairView(p);
+    return {
+      key:   `${p.address}:${prevRanks[p.address] ?? ''}:${launchPriceCache.has(p.address) ? 1 : 0}`,
+      price: pv.price,
+      vol:   pv.volH1,
+      liq:   p.liq,
+      chg:   [pv.chgM5, pv.chgH1, pv.chgH24],
+      tx:    pv.buysH1 + pv.sellsH1,
+    };
+  });
+  return {
+    key:  `${rows.map(r => r.key).join(',')}|${movers.map(m => `${m.name}+${m.delta}`).join(',')}`,
+    rows,
+  };
+}
+
+function relChangePct(prev, next) {
+  if (prev === next) return 0;
+  return Math.abs(next - prev) / Math.max(Math.abs(prev), 1e-12) * 100;
+}
+
+// lastBoard is the { hash, state, at } a chat last published
+function isMaterialChange(lastBoard, hash, state) {
+  if (!lastBoard) return true;
+  if (Date.now() - lastBoard.at >= Number(BOARD_MAX_SKIP_MINUTES) * 60_000) return true;
+  if (hash === lastBoard.hash) return false;
+  if (state.key !== lastBoard.state.key) return true;
+
+  const t = CHANGE_THRESHOLDS;
+  return state.rows.some((r, i) => {
+    const prev = lastBoard.state.rows[i];
+    return relChangePct(prev.price, r.price) > t.price ||
+           relChangePct(prev.vol,   r.vol)   > t.vol   ||
+           relChangePct(prev.liq,   r.liq)   > t.liq   ||
+           r.chg.some((c, j) => Math.abs(c - prev.chg[j]) > t.chg) ||
+           Math.abs(r.tx - prev.tx) > t.tx;
+  });
+}
+
+// ─── Scheduler ─────────────────────────────────────────────────────────────────
+// Runs task on wall-clock multiples of intervalMs (:00, :05, :10… for 5m), so
+// timer drift never accumulates. The next tick is armed only after the current
+// run settles, which makes runs single-flight; ticks missed by an overrun are
+// skipped rather than queued.
+
+function schedule(name, task, intervalMs, { immediate = false } = {}) {
+  const stats = { runs: 0, skipped: 0, lastMs: 0, maxMs: 0 };
+
+  const arm = (slot) => {
+    const now = Date.now();
+    let next  = slot + intervalMs;
+    if (next <= now) {
+      const missed = Math.ceil((now - next + 1) / intervalMs);
+      stats.skipped += missed;
+      next += missed * intervalMs;
+      console.warn(`[TrendingBot] ${name} overran, skipped ${missed} tick(s)`);
+    }
+    setTimeout(run, next - now, next);
+  };
+
+  const run = async (slot) => {
+    const started = Date.now();
+    try {
+      await task();
+    } catch (e) {
+      console.error(`[TrendingBot] ${name} failed:`, e.message);
+    }
+    stats.runs++;
+    stats.lastMs = Date.now() - started;
+    stats.maxMs  = Math.max(stats.maxMs, stats.lastMs);
+    arm(slot);
+  };
+
+  const now = Date.now();
+  if (immediate) run(now - (now % intervalMs));
+  else           arm(now - (now % intervalMs));
+  return stats;
+}
+
 // ─── Main loop ─────────────────────────────────────────────────────────────────
+// Fetching, scoring, launch prices and alerts run once per cycle; only the
+// per-chat board (blocked filter, ranks, render, publish) runs for every chat.
+
+// With staleSince set the board is re-rendered from the last good snapshot and the
+// chat's ranks are left untouched, so the next fresh cycle diffs against real data.
+
+async function postChatBoard(chat, nativePools, bridgePools, staleSince = null) {
+  const visible = p => !chat.blocked.has(p.symbol);
+  const native  = chat.blocked.size ? nativePools.filter(visible) : nativePools;
+  const bridge  = chat.blocked.size ? bridgePools.filter(visible) : bridgePools;
+
+  const rankMap = {};
+  for (let i = 0; i < native.length; i++) rankMap[native[i].address] = i;
+
+  const movers = native
+    .filter(p => {
+      const prev = chat.prevRanks[p.address];
+      return prev !== undefined && prev - rankMap[p.address] >= 3;
+    })
+    .slice(0, 3)
+    .map(p => ({
+      name:  getPairView(p).name,
+      delta: chat.prevRanks[p.address] - rankMap[p.address],
+    }));
+
+  const trending = native.slice(0, chat.size);
+
+  const rendered = stageSeconds.start({ stage: 'render' });
+  const text     = formatTrending(trending, bridge, movers, chat.prevRanks, staleSince);
+  const hash     = boardHash(text);
+  const state    = boardState(trending, bridge, movers, chat.prevRanks);
+  if (staleSince) state.key += '|stale';
+  const changed  = !chat.pinnedId || isMaterialChange(chat.lastBoard, hash, state);
+  rendered();
+
+  if (changed) {
+    const published = stageSeconds.start({ stage: 'publish' });
+    chat.pinnedId  = await sendQueue.push('board', chat.id, () => publishBoard(chat, text));
+    chat.lastBoard = { hash, state, at: Date.now() };
+    published();
+  }
+  if (!staleSince) chat.prevRanks = rankMap;
+  return changed;
+}
+
+function postBoards(nativePools, bridgePools, staleSince = null) {
+  return Promise.all(chats.map(chat =>
+    postChatBoard(chat, nativePools, bridgePools, staleSince).catch(e => {
+      console.error(`[TrendingBot] Failed to post trending to ${chat.id}:`, e.message);
+      return null;
+    })
+  ));
+}
+
+// Keeps boards up during an outage without touching series, ranks or state
+async function postStale() {
+  if (!lastGood) {
+    console.warn('[TrendingBot] No pool data yet — skipping cycle');
+    return;
+  }
+  const results = await postBoards(lastGood.nativePools, lastGood.bridgePools, lastGood.at);
+  console.warn(
+    `[TrendingBot] ⚠️ Stale cycle (breaker ${sourceBreaker.state}): ` +
+    `${results.filter(r => r === true).length} posted, snapshot ${ageStr(lastGood.at)} old`
+  );
+}
 
 async function postTrending() {
   try {
-    const allPools = await fetchPools();
+    const fetched = stageSeconds.start({ stage: 'fetch' });
+    const raw     = await loadPools();
+    fetched();
+    if (!raw) return await postStale();
+
+    const filtered = stageSeconds.start({ stage: 'filter' });
+    const pools    = filterPools(raw);
+    filtered();
+
+    const scored = stageSeconds.start({ stage: 'score' });
+    if (SWAP_INDEXER) applySwapAggregates(pools);
 
-    allPools.sort((a, b) => hotness(b) - hotness(a));
+    const ranked   = rankPools(pools);
+    const allPools = ranked.map(r => r.pool);
 
     // Split native tokens from bridge pairs
     const nativePools = allPools.filter(p => !isBridgePair(p));
     const bridgePools = allPools.filter(p =>  isBridgePair(p));
+    scored();
 
-    // Track ranks and h24 volumes for native tokens only
-    const newRankMap = {};
-    for (let i = 0; i < nativePools.length; i++) {
-      const addr = nativePools[i].attributes.address;
-      newRankMap[addr] = i;
-      prevH24Vol[addr] = Number(nativePools[i].attributes.volume_usd?.h24 || 0);
-    }
+    poolSeries.prune();
+    launchPriceCache.prune();
 
-    const movers = nativePools
-      .filter(p => {
-        const prev = prevRankMap[p.attributes.address];
-        return prev !== undefined && prev - newRankMap[p.attributes.address] >= 3;
-      })
-      .slice(0, 3)
-      .map(p => ({
-        name:  getPairView(p).name,
-        delta: prevRankMap[p.attributes.address] - newRankMap[p.attributes.address],
-      }));
+    // Pools blocked in every chat never reach a board, so they get no lookups
+    const listable = nativePools.filter(p => chats.some(c => !c.blocked.has(p.symbol)));
+    queueLaunchPrices(listable);
+    if (SWAP_INDEXER) {
+      trackSwaps(listable.slice(0, Number(SWAP_INDEXER_POOLS)))
+        .catch(e => console.error('[TrendingBot] Swap indexer update failed:', e.message));
+    }
 
-    await fetchLaunchPrices(nativePools);
-    await sendNewPoolAlerts(allPools);
+    // Exactly the pools on some chat's board, after that chat's blocked filter
+    const shownSet = new Set();
+    for (const chat of chats) {
+      const visible = p => !chat.blocked.has(p.symbol);
+      for (const p of nativePools.filter(visible).slice(0, chat.size)) shownSet.add(p);
+      for (const p of bridgePools.filter(visible).slice(0, 5))         shownSet.add(p);
+    }
+    const shown = [...shownSet];
+    watchPools(shown);
 
-    const trendingNative = nativePools.slice(0, Number(TRENDING_SIZE));
+    if (CHAIN_RPC_URL) {
+      await applyChainQuotes(shown)
+        .catch(e => console.error('[TrendingBot] On-chain quotes failed:', e.message));
+    }
 
-    if (lastPinnedId) {
-      await bot.unpinAllChatMessages(TELEGRAM_CHAT_ID).catch(() => {});
-      await bot.deleteMessage(TELEGRAM_CHAT_ID, lastPinnedId).catch(() => {});
+    // Extend the time series of native tokens only, and only with snapshots
+    // fetched since their last row — cold pools between crawls add nothing
+    const rows = {};
+    for (let i = 0; i < nativePools.length; i++) {
+      const p = nativePools[i];
+      if (!(p.fetchedAt > (poolSeries.peek(p.address)?.at('at') || 0))) continue;
+      rows[p.address] = [p.priceBase, p.liq, p.volH24, i, p.fetchedAt];
+      recordSeries(p.address, rows[p.address]);
     }
 
-    const msg = await bot.sendMessage(
-      TELEGRAM_CHAT_ID,
-      formatTrending(trendingNative, bridgePools, movers),
-      { parse_mode: 'HTML', disable_web_page_preview: true }
+    lastGood = { nativePools, bridgePools, at: Date.now() };
+
+    // Boards are queued first so alerts in the same cycle line up behind them
+    const boards = postBoards(nativePools, bridgePools);
+    sendNewPoolAlerts(allPools);
+    const results = await boards;
+
+    persist({ k: 'cycle', rows, chats: chatState() });
+    maybeCompactState();
+
+    const posted    = results.filter(r => r === true).length;
+    const unchanged = results.filter(r => r === false).length;
+    const { series: ss, launchPrice: ls, gecko: gs } = cacheStats();
+    console.log(
+      `[TrendingBot] ✅ Cycle: ${posted} posted, ${unchanged} unchanged, ${chats.length - posted - unchanged} failed` +
+      `  ·  ${nativePools.length} native, ${bridgePools.length} bridge` +
+      `  ·  series ${ss.size} (${ss.evictions} evicted)  ·  launch ${ls.size} (${ls.hits}/${ls.misses} hit/miss)` +
+      `  ·  api cache ${gs.hits}/${gs.misses} hit/miss, ${gs.coalesced} coalesced` +
+      `  ·  last cycle ${boardLoop.lastMs}ms`
     );
-
-    await bot.pinChatMessage(TELEGRAM_CHAT_ID, msg.message_id, { disable_notification: true });
-    lastPinnedId = msg.message_id;
-    prevRankMap  = newRankMap;
-
-    console.log(`[TrendingBot] ✅ Posted: ${trendingNative.length} native, ${bridgePools.length} bridge`);
   } catch (e) {
     console.error('[TrendingBot] Failed to post trending:', e.message);
   }
 }
 
+restoreState();
+const SWAP_INDEXER = Number(SWAP_INDEXER_POOLS) > 0 && !!CHAIN_WS_URL && !!CHAIN_RPC_URL;
+const chainRpc     = CHAIN_WS_URL ? new RpcSocket(CHAIN_WS_URL) : null;
+if (chainRpc) {
+  watchPoolCreation(chainRpc);
+  if (SWAP_INDEXER) {
+    chainRpc.onOpen(() => subscribeSwaps());
+    chainRpc.onClose(() => { swapSubId = null; });
+  }
+  chainRpc.connect().catch(e => console.error('[TrendingBot] Chain socket disabled:', e.message));
+}
+if (METRICS_PORT) serveMetrics(Number(METRICS_PORT));
 console.log('✅ BESC HyperChain Trending Bot started.');
-setInterval(postTrending, Number(POLL_INTERVAL_MINUTES) * 60 * 1000);
-postTrending();
+const boardLoop = schedule('Trending cycle', postTrending, Number(POLL_INTERVAL_MINUTES) * 60 * 1000, { immediate: true });
+const alertLoop = Number(ALERT_POLL_SECONDS) > 0
+  ? schedule('Alert poll', pollNewPools, Number(ALERT_POLL_SECONDS) * 1000)
+  : null;